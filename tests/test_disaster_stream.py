@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from 模型.disaster_warning import DisasterWarningModel
+
+
+def _weather_data(n_locations: int = 5, n_days: int = 120) -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    dates = pd.date_range('2022-01-01', periods=n_days)
+    data = pd.DataFrame([(location, date) for location in range(n_locations) for date in dates],
+                        columns=['location', 'date'])
+    n = len(data)
+    data['temperature'] = 20 + 10 * np.sin(data['date'].dt.dayofyear / 58) + rng.normal(0, 3, n)
+    data['humidity'] = rng.uniform(30, 95, n)
+    data['pressure'] = rng.normal(1010, 5, n)
+    data['rainfall'] = rng.gamma(1, 5, n)
+    data['disaster_occurrence'] = ((data['rainfall'] > 15) & (data['humidity'] > 70)).astype(int)
+    return data.sample(frac=1, random_state=1).reset_index(drop=True)
+
+
+def _stream_setup():
+    data = _weather_data()
+    cutoff = pd.Timestamp('2022-04-01')
+    model = DisasterWarningModel()
+    model.train_weather_model(data[data['date'] < cutoff])
+
+    features = model.prepare_weather_features(data)
+    batch = pd.Series(
+        model.predict_weather_risk(features.drop(['disaster_occurrence', 'date'], axis=1)), index=features.index
+    )
+    stream = model.create_risk_stream(data[data['date'] < cutoff])
+    new = data[data['date'] >= cutoff].drop(columns='disaster_occurrence')
+    return stream, new, batch
+
+
+def test_stream_matches_batch_features():
+    stream, new, batch = _stream_setup()
+    scored = pd.concat([stream.score_batch(day) for _, day in new.groupby('date')])
+
+    assert scored.index.isin(batch.index).all()
+    np.testing.assert_allclose(scored['probability'], batch[scored.index], rtol=1e-6)
+
+
+def test_stream_skips_stale_observations():
+    stream, new, batch = _stream_setup()
+    days = [day for _, day in new.groupby('date')]
+    stream.score_batch(days[0])
+
+    # 重复发送已处理的观测：不写入状态，概率为 NaN
+    replayed = stream.score_batch(days[0])
+    assert replayed['probability'].isna().all()
+
+    scored = stream.score_batch(days[1])
+    np.testing.assert_allclose(scored['probability'], batch[scored.index], rtol=1e-6)
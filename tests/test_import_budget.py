@@ -0,0 +1,14 @@
+import pytest
+
+from 模型.import_budget import DEFAULT_BUDGET_SECONDS, MODEL_MODULES, measure_import, package_modules
+
+
+def test_package_modules_include_model_modules():
+    assert set(MODEL_MODULES) <= set(package_modules())
+
+
+@pytest.mark.parametrize('module', package_modules())
+def test_import_budget(module):
+    result = measure_import(module)
+    assert result['heavy_modules'] == []
+    assert result['seconds'] <= DEFAULT_BUDGET_SECONDS
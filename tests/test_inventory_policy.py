@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from 模型.inventory_policy import compute_inventory_policies
+from 模型.supply_chain import SupplyChainModel
+
+
+def _inventory_data() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    n = 120
+    return pd.DataFrame({
+        'warehouse': np.repeat(['W1', 'W2'], n // 2),
+        'sku': np.tile(['A', 'B', 'C'], n // 3),
+        'inventory_level': rng.uniform(50, 150, n),
+        'demand': rng.uniform(5, 15, n),
+        'lead_time': rng.uniform(2, 6, n),
+        'storage_cost': rng.uniform(1, 3, n)
+    })
+
+
+def test_optimize_inventory_accepts_sku_level_parameters():
+    data = _inventory_data()
+    index = pd.MultiIndex.from_product([['W1', 'W2'], ['A', 'B', 'C']], names=['warehouse', 'sku'])
+    service_level = pd.Series([0.9, 0.95, 0.99, 0.9, 0.9, 0.9], index=index)
+
+    result = SupplyChainModel().optimize_inventory(data, service_level=service_level)
+
+    policies = result['inventory_policies'].set_index(['warehouse', 'sku'])
+    assert policies['service_level'].to_dict() == service_level.to_dict()
+    # 仓库汇总使用仓库内各 SKU 服务水平的均值
+    expected = compute_inventory_policies(data, ('warehouse',), service_level.groupby(level='warehouse').mean())
+    assert result['optimal_inventory']['W1']['safety_stock'] == pytest.approx(expected['safety_stock'].iloc[0])
+    assert result['optimal_inventory']['W2']['safety_stock'] == pytest.approx(expected['safety_stock'].iloc[1])
+
+
+def test_group_parameter_missing_group_raises():
+    data = _inventory_data()
+    service_level = pd.Series([0.9], index=pd.Index(['W1'], name='warehouse'))
+    with pytest.raises(ValueError):
+        compute_inventory_policies(data, ('warehouse',), service_level)
+
+
+def test_simulation_rejects_missing_reorder_point():
+    from 模型.inventory_simulation import simulate_inventory_policies
+
+    # 只有一条记录的仓库没有需求标准差，再订货点为空
+    data = _inventory_data().iloc[:61]
+    policies = compute_inventory_policies(data, ('warehouse',))
+    assert policies['reorder_point'].isna().any()
+    with pytest.raises(ValueError):
+        simulate_inventory_policies(policies, n_scenarios=10, horizon=10)
@@ -0,0 +1,33 @@
+import pandas as pd
+
+from 模型.consumer_behavior import ConsumerBehaviorModel
+
+REVIEWS_A = ['质量很好，价格便宜', '包装精美，质量不错', '价格便宜，包装完好'] * 5
+REVIEWS_B = ['物流很快，快递小哥态度好', '物流太慢了', '快递包装破损'] * 5
+
+
+def _topics(model, reviews):
+    data = pd.DataFrame({'review_text': reviews, 'rating': 4.0})
+    return model.analyze_brand_perception(data)['key_topics']
+
+
+def test_brand_perception_does_not_accumulate_keyword_counts():
+    model = ConsumerBehaviorModel()
+    first = _topics(model, REVIEWS_A)
+    _topics(model, REVIEWS_B)
+    assert _topics(model, REVIEWS_A) == first
+    assert model.keyword_model.n_documents == 0
+
+
+def test_update_keywords_accumulates_corpus(tmp_path):
+    path = str(tmp_path / 'keywords.json')
+    model = ConsumerBehaviorModel()
+    model.update_keywords(pd.Series(REVIEWS_A + REVIEWS_B), keyword_path=path)
+    assert model.keyword_model.n_documents == 30
+
+    # 新模型从保存的计数加载，品牌分析只读取、不修改
+    reloaded = ConsumerBehaviorModel()
+    data = pd.DataFrame({'review_text': REVIEWS_A, 'rating': 4.0})
+    topics = reloaded.analyze_brand_perception(data, keyword_path=path)['key_topics']
+    assert reloaded.keyword_model.n_documents == 30
+    assert topics == reloaded.analyze_brand_perception(data, keyword_path=path)['key_topics']
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from 模型.routing import RouteService
+
+
+def _service() -> RouteService:
+    data = pd.DataFrame({
+        'origin': ['N1', 'N2', 'N3', 'N4'],
+        'destination': ['N2', 'N3', 'N4', 'N5'],
+        'transport_cost': [1.0, 1.0, 1.0, 1.0],
+        'transport_time': [2.0, 2.0, 2.0, 2.0],
+        'transport_capacity': [10.0, 10.0, 10.0, 10.0]
+    })
+    return RouteService.from_logistics(data)
+
+
+def test_update_edge_rejects_unknown_pair():
+    service = _service()
+    before = service.route('N1', 'N5')
+    with pytest.raises(ValueError):
+        service.update_edge('N1', 'N5', cost=0.0)
+    assert service.route('N1', 'N5') == before
+    assert len(service.engine.edges) == 4
+
+
+def test_update_edge_changes_existing_weight():
+    service = _service()
+    service.route('N1', 'N5')
+    service.update_edge('N2', 'N3', cost=5.0)
+    assert service.route('N1', 'N5')['total_cost'] == 8.0
+
+
+def test_add_edge_requires_cost_and_time():
+    service = _service()
+    service.route('N1', 'N5')
+    service.add_edge('N1', 'N5', cost=0.5, time=1.0)
+    route = service.route('N1', 'N5')
+    assert route['path'] == ['N1', 'N5']
+    assert np.isfinite(route['total_time'])
+    with pytest.raises(ValueError):
+        service.add_edge('N1', 'N5', cost=1.0, time=1.0)
@@ -0,0 +1,27 @@
+import pickle
+
+import pytest
+
+from 模型.sentiment import LexiconSentimentScorer
+
+
+@pytest.fixture(scope='module')
+def scorer():
+    return LexiconSentimentScorer()
+
+
+@pytest.mark.parametrize('text', ['不好', '质量不好', '服务态度很差', '太贵了', '不是很好', '很不好', '不太新鲜'])
+def test_negated_and_intensified_compounds_are_negative(scorer, text):
+    assert scorer.score_batch([text])[0] < 0
+
+
+@pytest.mark.parametrize('text', ['很好', '非常满意', '质量很好，非常满意', '价格不贵', '不错'])
+def test_positive_reviews(scorer, text):
+    assert scorer.score_batch([text])[0] > 0
+
+
+def test_private_tokenizer_is_not_pickled(scorer):
+    scorer.score_batch(['很好'])
+    restored = pickle.loads(pickle.dumps(scorer))
+    assert restored._tokenizer is None
+    assert restored.score_batch(['太贵了'])[0] < 0
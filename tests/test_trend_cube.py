@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from 模型.consumer_behavior import ConsumerBehaviorModel
+from 模型.market_analysis import MarketAnalysisModel
+
+
+def _sales(brand: str, scale: float) -> pd.DataFrame:
+    dates = pd.date_range('2022-01-01', periods=24, freq='MS')
+    return pd.DataFrame({
+        'date': dates,
+        'category': '水果',
+        'brand': brand,
+        'region': '华东',
+        'amount': np.arange(1, 25, dtype=np.float64) * scale,
+        'quantity': 1,
+        'profit_margin': 0.2,
+        'price': np.linspace(1.0, 2.0, 24) * scale,
+        'demand': 10.0,
+        'commodity': '苹果',
+        'market': '北京'
+    })
+
+
+def test_same_shaped_frames_get_their_own_cube():
+    a, b = _sales('A', 1.0), _sales('B', 100.0)
+
+    market = MarketAnalysisModel()
+    yearly_a = market.analyze_seasonality(a)['yearly']
+    yearly_b = market.analyze_seasonality(b)['yearly']
+    np.testing.assert_allclose(list(yearly_b.values()), np.array(list(yearly_a.values())) * 100)
+
+    consumer = ConsumerBehaviorModel()
+    consumer.analyze_market_trends(a)
+    top_brands = consumer.analyze_market_trends(b)['market_concentration']['top_brands']
+    assert list(top_brands) == ['B']
+
+
+def test_market_trends_without_data_reuse_existing_cube():
+    consumer = ConsumerBehaviorModel()
+    trends = consumer.analyze_market_trends(_sales('A', 1.0))
+    cube = consumer.trend_cube
+    assert consumer.analyze_market_trends()['product_portfolio'] == trends['product_portfolio']
+    assert consumer.trend_cube is cube
@@ -0,0 +1,31 @@
+"""农业分析模型包
+
+模型类在首次访问时才导入对应模块；各模块只在需要重量级依赖的方法运行时才加载它们。
+"""
+import importlib
+import logging
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# 模型类 -> 所在模块
+_MODEL_MODULES = {
+    'MarketAnalysisModel': 'market_analysis',
+    'DisasterWarningModel': 'disaster_warning',
+    'ResourcePlanningModel': 'resource_planning',
+    'SupplyChainModel': 'supply_chain',
+    'PolicyAnalysisModel': 'policy_analysis',
+    'ConsumerBehaviorModel': 'consumer_behavior'
+}
+
+__all__ = list(_MODEL_MODULES)
+
+
+def __getattr__(name: str):
+    if name in _MODEL_MODULES:
+        module = importlib.import_module(f'.{_MODEL_MODULES[name]}', __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Mapping, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 品牌属性词典：属性名 -> 触发词
+ATTRIBUTE_LEXICON = {
+    'quality': ('质量', '品质'),
+    'price': ('价格', '便宜', '贵'),
+    'service': ('服务', '态度'),
+    'packaging': ('包装', '外观')
+}
+# 属性掩码为 uint64，最多 64 个属性
+MAX_ATTRIBUTES = 64
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class AttributeMatcher:
+    """基于 Aho–Corasick 自动机的多关键词属性匹配
+
+    全部触发词编译为一张稠密状态转移表，评论按长度排序后分块补齐成字符矩阵，
+    对所有评论逐列同步转移状态，一次扫描即可得到每条评论的属性位掩码；
+    扫描代价与属性和触发词的数量无关。
+    """
+
+    def __init__(self, lexicon: Mapping[str, Sequence[str]] = ATTRIBUTE_LEXICON,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if len(lexicon) > MAX_ATTRIBUTES:
+            raise ValueError(f"属性数量不能超过{MAX_ATTRIBUTES}个")
+        self.attributes = list(lexicon)
+        self.chunk_size = chunk_size
+        self._build(lexicon)
+
+    def _build(self, lexicon: Mapping[str, Sequence[str]]):
+        """构建字典树，再按广度优先补全失败转移，得到稠密转移表"""
+        words = [(bit, word) for bit, attribute in enumerate(self.attributes) for word in lexicon[attribute] if word]
+        # 触发词中出现的字符编为 1..n，其余字符（含补齐用的空字符）为 0
+        self.symbols = np.array(sorted({ord(ch) for _, word in words for ch in word}), dtype=np.uint32)
+        symbol_of = {int(code): index + 1 for index, code in enumerate(self.symbols)}
+
+        children = [{}]
+        outputs = [0]
+        for bit, word in words:
+            state = 0
+            for ch in word:
+                symbol = symbol_of[ord(ch)]
+                if symbol not in children[state]:
+                    children[state][symbol] = len(children)
+                    children.append({})
+                    outputs.append(0)
+                state = children[state][symbol]
+            outputs[state] |= 1 << bit
+
+        transitions = np.zeros((len(children), len(self.symbols) + 1), dtype=np.int32)
+        fail = [0] * len(children)
+        queue = [0]
+        for state in queue:
+            for symbol in range(1, len(self.symbols) + 1):
+                child = children[state].get(symbol)
+                if child is None:
+                    transitions[state, symbol] = transitions[fail[state], symbol] if state else 0
+                    continue
+                fail[child] = transitions[fail[state], symbol] if state else 0
+                outputs[child] |= outputs[fail[child]]
+                transitions[state, symbol] = child
+                queue.append(child)
+
+        self.transitions = transitions
+        self.outputs = np.array(outputs, dtype=np.uint64)
+
+    def _scan(self, texts: List[str]) -> np.ndarray:
+        """扫描一块长度相近的文本，返回属性掩码"""
+        width = max(len(text) for text in texts)
+        if width == 0:
+            return np.zeros(len(texts), dtype=np.uint64)
+        codes = np.array(texts, dtype=f'<U{width}').view(np.uint32).reshape(len(texts), width)
+        positions = np.searchsorted(self.symbols, codes)
+        hit = self.symbols[np.minimum(positions, len(self.symbols) - 1)] == codes
+        symbols = np.where(hit, positions + 1, 0)
+
+        states = np.zeros(len(texts), dtype=np.int32)
+        masks = np.zeros(len(texts), dtype=np.uint64)
+        for column in range(width):
+            states = self.transitions[states, symbols[:, column]]
+            masks |= self.outputs[states]
+        return masks
+
+    def match(self, texts: pd.Series) -> pd.Series:
+        """每条评论的属性位掩码（第 i 位对应 attributes[i]），缺失文本为 0"""
+        codes, uniques = pd.factorize(texts)
+        unique_masks = np.zeros(len(uniques), dtype=np.uint64)
+        if len(uniques) and len(self.symbols):
+            values = [str(text) for text in uniques]
+            # 按长度排序后分块，减少补齐的空字符
+            order = np.argsort([len(text) for text in values], kind='stable')
+            for start in range(0, len(order), self.chunk_size):
+                chunk = order[start:start + self.chunk_size]
+                unique_masks[chunk] = self._scan([values[i] for i in chunk])
+        masks = np.where(codes >= 0, unique_masks[np.maximum(codes, 0)], np.uint64(0))
+        return pd.Series(masks.astype(np.uint64), index=texts.index, name='attribute_mask')
+
+    def to_frame(self, masks: pd.Series) -> pd.DataFrame:
+        """把位掩码展开为每个属性一列的布尔表"""
+        values = masks.to_numpy(dtype=np.uint64)
+        return pd.DataFrame({
+            attribute: (values >> np.uint64(bit)) & np.uint64(1) == 1
+            for bit, attribute in enumerate(self.attributes)
+        }, index=masks.index)
+
+    def rates(self, texts: pd.Series) -> Dict[str, float]:
+        """各属性被提及的评论比例"""
+        if len(texts) == 0:
+            return {attribute: float('nan') for attribute in self.attributes}
+        return self.to_frame(self.match(texts)).mean().to_dict()
\ No newline at end of file
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# 关联规则的默认最小支持度、最小置信度，以及每个产品保留的关联产品数
+DEFAULT_MIN_SUPPORT = 0.001
+DEFAULT_MIN_CONFIDENCE = 0.1
+DEFAULT_TOP_N = 10
+AFFINITY_METRICS = ('support', 'confidence', 'lift')
+
+# FP 树节点：[产品编号, 计数, 父节点, 子节点字典]
+_ITEM, _COUNT, _PARENT, _CHILDREN = range(4)
+
+
+def _mine_fp_tree(patterns: List[Tuple[Tuple[int, ...], int]], suffix: Tuple[int, ...], min_count: int,
+                  max_length: Optional[int], results: List[Tuple[Tuple[int, ...], int]]):
+    """FP-growth：由（条件）模式基构建 FP 树并递归挖掘以 suffix 结尾的频繁项集"""
+    counts = Counter()
+    for items, count in patterns:
+        for item in items:
+            counts[item] += count
+    frequent = {item: count for item, count in counts.items() if count >= min_count}
+    if not frequent:
+        return
+    rank = {item: position for position, item in enumerate(sorted(frequent, key=lambda i: (-frequent[i], i)))}
+
+    root = [None, 0, None, {}]
+    header = {item: [] for item in frequent}
+    for items, count in patterns:
+        node = root
+        for item in sorted((i for i in items if i in rank), key=rank.__getitem__):
+            child = node[_CHILDREN].get(item)
+            if child is None:
+                child = [item, 0, node, {}]
+                node[_CHILDREN][item] = child
+                header[item].append(child)
+            child[_COUNT] += count
+            node = child
+
+    # 从支持度最低的项开始，沿节点链收集条件模式基
+    for item in sorted(frequent, key=rank.__getitem__, reverse=True):
+        itemset = (item,) + suffix
+        results.append((itemset, frequent[item]))
+        if max_length is not None and len(itemset) >= max_length:
+            continue
+        conditional = []
+        for node in header[item]:
+            path = []
+            parent = node[_PARENT]
+            while parent is not root:
+                path.append(parent[_ITEM])
+                parent = parent[_PARENT]
+            if path:
+                conditional.append((tuple(path), node[_COUNT]))
+        _mine_fp_tree(conditional, itemset, min_count, max_length, results)
+
+
+class BasketAffinity:
+    """基于稀疏交易-产品矩阵的购物篮关联分析
+
+    交易与产品构成 CSR 关联矩阵，产品对的共现次数由一次稀疏矩阵乘积得到；
+    支持度低于 min_support 的产品和产品对先被剪枝，再计算置信度和提升度。
+    """
+
+    def __init__(self, min_support: float = DEFAULT_MIN_SUPPORT, top_n: int = DEFAULT_TOP_N,
+                 metric: str = 'lift'):
+        if metric not in AFFINITY_METRICS:
+            raise ValueError(f"未知的关联度量: {metric}，可选: {list(AFFINITY_METRICS)}")
+        self.min_support = min_support
+        self.top_n = top_n
+        self.metric = metric
+        self.products = None
+        self.incidence = None
+        self.item_counts = None
+        self.n_transactions = 0
+        self.pairs = None
+
+    def _min_count(self, min_support: float) -> int:
+        return max(int(math.ceil(min_support * self.n_transactions - 1e-9)), 1)
+
+    def fit(self, data: pd.DataFrame, transaction_col: str = 'transaction_id',
+            product_col: str = 'product_id', quantity_col: str = 'quantity') -> 'BasketAffinity':
+        """构建关联矩阵并计算满足最小支持度的产品对"""
+        from scipy.sparse import coo_matrix
+
+        transaction_codes, transactions = pd.factorize(data[transaction_col], sort=True)
+        product_codes, self.products = pd.factorize(data[product_col], sort=True)
+        valid = (transaction_codes >= 0) & (product_codes >= 0)
+        quantities = data[quantity_col].fillna(0).to_numpy(dtype=np.float64)[valid]
+
+        # 同一交易中同一产品的数量先求和，数量为正才视为购买
+        self.n_transactions = len(transactions)
+        totals = coo_matrix(
+            (quantities, (transaction_codes[valid], product_codes[valid])),
+            shape=(self.n_transactions, len(self.products))
+        ).tocsr()
+        totals.sum_duplicates()
+        self.incidence = (totals > 0).astype(np.int32)
+        self.incidence.eliminate_zeros()
+        self.item_counts = np.asarray(self.incidence.sum(axis=0)).ravel()
+
+        self.pairs = self._pair_statistics()
+        logger.info(
+            f"购物篮分析：{self.n_transactions}笔交易，{len(self.products)}个产品，{len(self.pairs)}个频繁产品对"
+        )
+        return self
+
+    def _pair_statistics(self) -> pd.DataFrame:
+        """计算频繁产品对的共现次数、支持度、置信度和提升度（双向规则）"""
+        min_count = self._min_count(self.min_support)
+        frequent = np.flatnonzero(self.item_counts >= min_count)
+        cooccurrence = (self.incidence[:, frequent].T @ self.incidence[:, frequent]).tocoo()
+        keep = (cooccurrence.row != cooccurrence.col) & (cooccurrence.data >= min_count)
+        antecedent = frequent[cooccurrence.row[keep]]
+        consequent = frequent[cooccurrence.col[keep]]
+        counts = cooccurrence.data[keep].astype(np.int64)
+        order = np.lexsort((consequent, antecedent))
+        antecedent, consequent, counts = antecedent[order], consequent[order], counts[order]
+
+        support = counts / self.n_transactions
+        confidence = counts / self.item_counts[antecedent]
+        lift = confidence / (self.item_counts[consequent] / self.n_transactions)
+        return pd.DataFrame({
+            'antecedent': self.products[antecedent],
+            'consequent': self.products[consequent],
+            'count': counts,
+            'support': support,
+            'confidence': confidence,
+            'lift': lift
+        })
+
+    @property
+    def product_support(self) -> pd.Series:
+        """各产品的支持度"""
+        if self.products is None:
+            raise ValueError("模型未训练")
+        return pd.Series(self.item_counts / max(self.n_transactions, 1), index=self.products)
+
+    def rules(self, min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> pd.DataFrame:
+        """置信度高于 min_confidence 的关联规则"""
+        if self.pairs is None:
+            raise ValueError("模型未训练")
+        return self.pairs[self.pairs['confidence'] > min_confidence].reset_index(drop=True)
+
+    def top_associations(self, top_n: Optional[int] = None, metric: Optional[str] = None) -> pd.DataFrame:
+        """每个产品按 metric 排名前 top_n 的关联产品"""
+        if self.pairs is None:
+            raise ValueError("模型未训练")
+        top_n = top_n or self.top_n
+        metric = metric or self.metric
+        ranked = self.pairs.sort_values(['antecedent', metric, 'consequent'], ascending=[True, False, True])
+        top = ranked.groupby('antecedent', sort=False).head(top_n).reset_index(drop=True)
+        return top.assign(rank=top.groupby('antecedent', sort=False).cumcount() + 1)
+
+    def frequent_itemsets(self, min_support: Optional[float] = None, max_length: Optional[int] = 3) -> pd.DataFrame:
+        """用 FP-growth 挖掘频繁项集"""
+        if self.incidence is None:
+            raise ValueError("模型未训练")
+        min_count = self._min_count(self.min_support if min_support is None else min_support)
+        frequent = self.item_counts >= min_count
+        # 只保留频繁产品，相同的交易合并计数
+        incidence = self.incidence[:, np.flatnonzero(frequent)].tocsr()
+        baskets = Counter(
+            tuple(incidence.indices[start:end])
+            for start, end in zip(incidence.indptr[:-1], incidence.indptr[1:]) if end > start
+        )
+        results = []
+        _mine_fp_tree(list(baskets.items()), (), min_count, max_length, results)
+
+        frequent_products = self.products[np.flatnonzero(frequent)]
+        itemsets = pd.DataFrame({
+            'itemset': [tuple(frequent_products[list(items)]) for items, _ in results],
+            'count': np.array([count for _, count in results], dtype=np.int64)
+        })
+        itemsets['support'] = itemsets['count'] / self.n_transactions
+        itemsets['length'] = itemsets['itemset'].map(len)
+        return itemsets.sort_values(['length', 'count'], ascending=[True, False]).reset_index(drop=True)
+
+    def to_dict(self, top_n: Optional[int] = None, metric: Optional[str] = None) -> Dict:
+        """产品支持度，以及每个产品前 top_n 个关联产品的记录列表（含支持度、置信度和提升度）
+
+        只输出排名靠前的关联，结果大小随产品数线性增长，而非随产品对数平方增长。
+        """
+        return {
+            'product_support': self.product_support.to_dict(),
+            'top_associations': self.top_associations(top_n, metric).to_dict('records')
+        }
\ No newline at end of file
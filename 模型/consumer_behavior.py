@@ -1,170 +1,259 @@
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
 from typing import Dict, List, Tuple, Optional
 import logging
+import os
 from datetime import datetime
-from sklearn.decomposition import PCA
-from textblob import TextBlob
-import jieba
-import jieba.analyse
+from .model_registry import PersistableModel
+from .sentiment import SentimentPipeline
+from .keywords import IncrementalKeywordExtractor
+from .attribute_matcher import AttributeMatcher, ATTRIBUTE_LEXICON
+from .basket_affinity import BasketAffinity, DEFAULT_MIN_SUPPORT, DEFAULT_TOP_N
+from .trend_cube import TrendCube, ROWS
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ConsumerBehaviorModel:
+# 客户分群特征：最近一次购买距今天数、购买次数、平均消费额、平均购物篮大小
+CUSTOMER_FEATURES = ['recency', 'purchase_frequency', 'average_spending', 'basket_size']
+
+class ConsumerBehaviorModel(PersistableModel):
+    persistent_attributes = ('preference_model', 'sentiment_model', 'keyword_model', 'trend_cube', 'scaler')
+
     def __init__(self):
+        from sklearn.preprocessing import StandardScaler
+
         self.preference_model = None
         self.sentiment_model = None
+        self.keyword_model = None
+        self.trend_cube = None
         self.scaler = StandardScaler()
         
-    def analyze_consumption_patterns(self, data: pd.DataFrame) -> Dict:
-        """分析消费模式"""
+    def analyze_consumption_patterns(self, data: pd.DataFrame, n_segments: int = 4,
+                                     batch_size: int = 4096) -> Dict:
+        """分析消费模式
+        
+        先按客户汇总为每人一行的 RFM 特征，再用 MiniBatchKMeans 分为 n_segments 群；
+        新客户可用 assign_customer_segments 归入已有分群。
+        """
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+
         # 准备特征
-        features = data.copy()
-        features['purchase_frequency'] = features.groupby('customer_id')['date'].transform('count')
-        features['average_spending'] = features.groupby('customer_id')['amount'].transform('mean')
+        customers = self._customer_features(data)
         
         # 客户分群
-        X = features[['purchase_frequency', 'average_spending', 'basket_size']].values
-        X_scaled = self.scaler.fit_transform(X)
-        
-        kmeans = KMeans(n_clusters=4, random_state=42)
-        features['customer_segment'] = kmeans.fit_predict(X_scaled)
+        self.scaler = StandardScaler()
+        X_scaled = self.scaler.fit_transform(customers[CUSTOMER_FEATURES])
+        kmeans = MiniBatchKMeans(n_clusters=n_segments, random_state=42,
+                                 batch_size=min(batch_size, len(customers)), n_init=3)
+        segments = pd.Series(kmeans.fit_predict(X_scaled), index=customers.index, name='customer_segment')
+        self.preference_model = kmeans
         
         # 分析消费特征
         consumption_patterns = {
-            'customer_segments': {
-                segment: {
-                    'size': len(features[features['customer_segment'] == segment]),
-                    'avg_frequency': features[features['customer_segment'] == segment]['purchase_frequency'].mean(),
-                    'avg_spending': features[features['customer_segment'] == segment]['average_spending'].mean(),
-                    'preferred_categories': features[features['customer_segment'] == segment]['category'].value_counts().head(3).to_dict()
-                }
-                for segment in range(4)
-            },
-            'seasonal_trends': self._analyze_seasonal_trends(features),
-            'product_affinity': self._calculate_product_affinity(features)
+            'customer_segments': self._summarize_segments(data, customers, segments, n_segments),
+            'seasonal_trends': self._analyze_seasonal_trends(self.build_trend_cube(data)),
+            'product_affinity': self._calculate_product_affinity(data)
         }
         
         return consumption_patterns
     
-    def _analyze_seasonal_trends(self, data: pd.DataFrame) -> Dict:
+    def _customer_features(self, data: pd.DataFrame, reference_date=None) -> pd.DataFrame:
+        """一次分组汇总出每个客户的特征，recency 相对 reference_date（默认为数据中最晚日期）"""
+        dates = pd.to_datetime(data['date'])
+        customers = data.assign(date=dates).groupby('customer_id').agg(
+            last_purchase=('date', 'max'),
+            purchase_frequency=('date', 'count'),
+            average_spending=('amount', 'mean'),
+            basket_size=('basket_size', 'mean')
+        )
+        reference_date = dates.max() if reference_date is None else pd.Timestamp(reference_date)
+        customers['recency'] = (reference_date - customers['last_purchase']).dt.days
+        return customers
+    
+    def _summarize_segments(self, data: pd.DataFrame, customers: pd.DataFrame,
+                            segments: pd.Series, n_segments: int) -> Dict:
+        """一次分组聚合计算各客户群的统计量"""
+        stats = customers.assign(customer_segment=segments).groupby('customer_segment').agg(
+            size=('purchase_frequency', 'size'),
+            avg_frequency=('purchase_frequency', 'mean'),
+            avg_spending=('average_spending', 'mean'),
+            avg_recency=('recency', 'mean')
+        ).reindex(range(n_segments))
+        stats['size'] = stats['size'].fillna(0).astype(int)
+        
+        # 各客户群购买最多的前3个品类
+        category_counts = data.groupby([data['customer_id'].map(segments).rename('customer_segment'), 'category']).size()
+        top_categories = category_counts.sort_values(ascending=False, kind='stable').groupby(level=0).head(3)
+        preferred = {segment: {} for segment in range(n_segments)}
+        for (segment, category), count in top_categories.items():
+            preferred[int(segment)][category] = count
+        
+        return {
+            segment: {**row, 'preferred_categories': preferred[segment]}
+            for segment, row in zip(range(n_segments), stats.to_dict('records'))
+        }
+    
+    def assign_customer_segments(self, data: pd.DataFrame, reference_date=None) -> pd.Series:
+        """把（新）客户归入已有分群，返回以 customer_id 为索引的分群编号"""
+        if self.preference_model is None:
+            raise ValueError("模型未训练")
+        customers = self._customer_features(data, reference_date)
+        labels = self.preference_model.predict(self.scaler.transform(customers[CUSTOMER_FEATURES]))
+        return pd.Series(labels, index=customers.index, name='customer_segment')
+    
+    def update_customer_segments(self, data: pd.DataFrame, reference_date=None):
+        """用新客户数据增量更新分群中心"""
+        if not hasattr(self.preference_model, 'partial_fit'):
+            raise ValueError("模型未训练")
+        customers = self._customer_features(data, reference_date)
+        self.preference_model.partial_fit(self.scaler.transform(customers[CUSTOMER_FEATURES]))
+        return self
+    
+    def build_trend_cube(self, data: pd.DataFrame) -> TrendCube:
+        """由销售数据构建按月份、品类、品牌、地区预聚合的销售立方体"""
+        self.trend_cube = TrendCube.from_frame(data)
+        return self.trend_cube
+    
+    def update_trend_cube(self, new_sales: pd.DataFrame) -> TrendCube:
+        """把新到达的销售数据增量合并进立方体"""
+        if self.trend_cube is None:
+            return self.build_trend_cube(new_sales)
+        return self.trend_cube.update(new_sales)
+    
+    def _analyze_seasonal_trends(self, cube: TrendCube) -> Dict:
         """分析季节性趋势"""
-        data['month'] = pd.to_datetime(data['date']).dt.month
-        data['season'] = pd.to_datetime(data['date']).dt.quarter
+        by_season = cube.rollup(['quarter'])['amount_sum']
+        season_categories = cube.rollup(['quarter', 'category'])[ROWS]
         
         seasonal_trends = {
-            'monthly_sales': data.groupby('month')['amount'].sum().to_dict(),
+            'monthly_sales': cube.rollup(['month'])['amount_sum'].to_dict(),
             'seasonal_preferences': {
-                season: data[data['season'] == season]['category'].value_counts().head(5).to_dict()
+                season: (season_categories.xs(season, level='quarter').nlargest(5).to_dict()
+                         if season in by_season.index else {})
                 for season in range(1, 5)
             },
-            'peak_seasons': data.groupby('season')['amount'].sum().nlargest(2).index.tolist()
+            'peak_seasons': by_season.nlargest(2).index.tolist()
         }
         
         return seasonal_trends
     
-    def _calculate_product_affinity(self, data: pd.DataFrame) -> Dict:
-        """计算产品关联性"""
-        # 构建购物篮分析
-        transactions = data.groupby(['transaction_id', 'product_id'])['quantity'].sum().unstack().fillna(0)
-        
-        # 计算支持度和置信度
-        support = (transactions > 0).sum() / len(transactions)
-        confidence = {}
+    def _calculate_product_affinity(self, data: pd.DataFrame, min_support: float = DEFAULT_MIN_SUPPORT,
+                                    top_n: int = DEFAULT_TOP_N) -> Dict:
+        """计算产品关联性
         
-        for prod1 in transactions.columns:
-            for prod2 in transactions.columns:
-                if prod1 != prod2:
-                    confidence[(prod1, prod2)] = (
-                        ((transactions[prod1] > 0) & (transactions[prod2] > 0)).sum() /
-                        (transactions[prod1] > 0).sum()
-                    )
-        
-        return {
-            'product_support': support.to_dict(),
-            'product_confidence': {f"{k[0]}->{k[1]}": v for k, v in confidence.items() if v > 0.1}
-        }
+        基于稀疏购物篮矩阵计算支持度、置信度和提升度，top_associations 为每个产品
+        按提升度排名前 top_n 的关联产品（记录列表）。
+        """
+        return BasketAffinity(min_support, top_n).fit(data).to_dict()
     
-    def analyze_brand_perception(self, data: pd.DataFrame) -> Dict:
-        """分析品牌感知"""
+    def analyze_brand_perception(self, data: pd.DataFrame, scorer='lexicon', n_jobs: int = 1,
+                                 cache_path: Optional[str] = None,
+                                 attribute_lexicon: Optional[Dict[str, Tuple[str, ...]]] = None,
+                                 keyword_path: Optional[str] = None) -> Dict:
+        """分析品牌感知
+
+        scorer 为 'lexicon'（jieba 分词+中文情感词典）、'textblob' 或实现了 score_batch
+        的对象；情感得分按评论文本缓存，重复分析时只为新评论评分。attribute_lexicon
+        为属性名到触发词的映射，默认使用 ATTRIBUTE_LEXICON。关键词按本次评论的词频和
+        累计文档频率（复用 keyword_model，或从 keyword_path 加载）计算；这里只读取
+        累计计数，累加新评论请使用 update_keywords。
+        """
         # 情感分析
-        data['sentiment_score'] = data['review_text'].apply(self._analyze_sentiment)
+        sentiment_score = self.score_sentiment(data['review_text'], scorer, n_jobs, cache_path)
         
         # 关键词提取
-        all_reviews = ' '.join(data['review_text'].fillna(''))
-        keywords = jieba.analyse.extract_tags(all_reviews, topK=20, withWeight=True)
+        keywords = self._keyword_extractor(keyword_path).extract(data['review_text'], 20, n_jobs)
         
         brand_perception = {
             'sentiment_distribution': {
-                'positive': (data['sentiment_score'] > 0).mean(),
-                'neutral': (data['sentiment_score'] == 0).mean(),
-                'negative': (data['sentiment_score'] < 0).mean()
+                'positive': (sentiment_score > 0).mean(),
+                'neutral': (sentiment_score == 0).mean(),
+                'negative': (sentiment_score < 0).mean()
             },
             'average_rating': data['rating'].mean(),
             'key_topics': {word: weight for word, weight in keywords},
-            'brand_attributes': self._extract_brand_attributes(data)
+            'brand_attributes': self._extract_brand_attributes(data, attribute_lexicon)
         }
         
         return brand_perception
     
-    def _analyze_sentiment(self, text: str) -> float:
-        """分析文本情感"""
-        if pd.isna(text):
-            return 0
-        return TextBlob(text).sentiment.polarity
+    def score_sentiment(self, texts: pd.Series, scorer='lexicon', n_jobs: int = 1,
+                        cache_path: Optional[str] = None) -> pd.Series:
+        """批量计算评论情感得分，复用同一评分器的流水线及其缓存"""
+        pipeline = self.sentiment_model
+        scorer_name = scorer if isinstance(scorer, str) else getattr(scorer, 'name', type(scorer).__name__)
+        if (not isinstance(pipeline, SentimentPipeline) or pipeline.scorer_name != scorer_name or
+                (cache_path is not None and pipeline.cache_path != cache_path)):
+            pipeline = SentimentPipeline(scorer, n_jobs, cache_path=cache_path)
+            self.sentiment_model = pipeline
+        pipeline.n_jobs = n_jobs
+        return pipeline.score(texts)
+    
+    def _keyword_extractor(self, keyword_path: Optional[str] = None) -> IncrementalKeywordExtractor:
+        """已有的关键词统计；尚未建立时从 keyword_path 加载，文件不存在则新建"""
+        if self.keyword_model is None:
+            if keyword_path is not None and os.path.exists(keyword_path):
+                self.keyword_model = IncrementalKeywordExtractor.load(keyword_path)
+            else:
+                self.keyword_model = IncrementalKeywordExtractor()
+        return self.keyword_model
     
-    def _extract_brand_attributes(self, data: pd.DataFrame) -> Dict:
+    def update_keywords(self, texts: pd.Series, top_k: int = 20, n_jobs: int = 1,
+                        keyword_path: Optional[str] = None) -> Dict[str, float]:
+        """用新评论增量更新关键词统计，返回最新的热点话题；指定 keyword_path 时加载并写回计数"""
+        self._keyword_extractor(keyword_path).partial_fit(texts, n_jobs)
+        if keyword_path is not None:
+            self.keyword_model.save(keyword_path)
+        return dict(self.keyword_model.top_k(top_k))
+    
+    def _extract_brand_attributes(self, data: pd.DataFrame,
+                                  lexicon: Optional[Dict[str, Tuple[str, ...]]] = None) -> Dict:
         """提取品牌属性"""
-        # 提取评论中提到的产品属性
-        attributes = {
-            'quality': len(data[data['review_text'].str.contains('质量|品质', na=False)]) / len(data),
-            'price': len(data[data['review_text'].str.contains('价格|便宜|贵', na=False)]) / len(data),
-            'service': len(data[data['review_text'].str.contains('服务|态度', na=False)]) / len(data),
-            'packaging': len(data[data['review_text'].str.contains('包装|外观', na=False)]) / len(data)
-        }
-        
-        return attributes
+        # 一次扫描匹配评论中提到的全部产品属性
+        matcher = AttributeMatcher(lexicon or ATTRIBUTE_LEXICON)
+        return matcher.rates(data['review_text'])
     
-    def analyze_market_trends(self, data: pd.DataFrame) -> Dict:
-        """分析市场趋势"""
-        # 准备特征
-        features = data.copy()
-        features['year_month'] = pd.to_datetime(features['date']).dt.to_period('M')
+    def analyze_market_trends(self, data: Optional[pd.DataFrame] = None) -> Dict:
+        """分析市场趋势
+        
+        传入 data 时重新构建立方体；data 为空时直接读取已有的趋势立方体
+        （见 build_trend_cube / update_trend_cube）。
+        """
+        if data is not None:
+            self.build_trend_cube(data)
+        if self.trend_cube is None:
+            raise ValueError("趋势立方体未构建")
+        cube = self.trend_cube
         
         # 计算增长率
-        monthly_sales = features.groupby('year_month')['amount'].sum()
+        monthly_sales = cube.rollup(['period'])['amount_sum']
         growth_rate = monthly_sales.pct_change()
         
         # 产品组合分析
-        product_mix = features.groupby('category').agg({
-            'amount': 'sum',
-            'quantity': 'sum',
-            'profit_margin': 'mean'
-        })
+        product_mix = cube.rollup(['category'])
+        product_mix['profit_margin'] = cube.mean(['category'], 'profit_margin')
         
         market_trends = {
             'sales_growth': {
                 'monthly_growth': growth_rate.mean() * 100,
                 'growth_stability': growth_rate.std(),
-                'top_growing_categories': features.groupby('category')['amount'].sum().pct_change().nlargest(5).to_dict()
+                'top_growing_categories': product_mix['amount_sum'].pct_change().nlargest(5).to_dict()
             },
             'product_portfolio': {
-                'category_contribution': (product_mix['amount'] / product_mix['amount'].sum()).to_dict(),
+                'category_contribution': (product_mix['amount_sum'] / product_mix['amount_sum'].sum()).to_dict(),
                 'profit_margins': product_mix['profit_margin'].to_dict(),
-                'volume_share': (product_mix['quantity'] / product_mix['quantity'].sum()).to_dict()
+                'volume_share': (product_mix['quantity_sum'] / product_mix['quantity_sum'].sum()).to_dict()
             },
-            'market_concentration': self._calculate_market_concentration(features)
+            'market_concentration': self._calculate_market_concentration(cube)
         }
         
         return market_trends
     
-    def _calculate_market_concentration(self, data: pd.DataFrame) -> Dict:
+    def _calculate_market_concentration(self, cube: TrendCube) -> Dict:
         """计算市场集中度"""
-        total_sales = data['amount'].sum()
-        brand_sales = data.groupby('brand')['amount'].sum()
+        total_sales = cube.total('amount')
+        brand_sales = cube.rollup(['brand'])['amount_sum']
         
         # 计算赫芬达尔指数
         hhi = ((brand_sales / total_sales) ** 2).sum()
@@ -183,7 +272,8 @@ class ConsumerBehaviorModel:
         """生成消费者行为分析报告"""
         consumption_patterns = self.analyze_consumption_patterns(sales_data)
         brand_perception = self.analyze_brand_perception(review_data)
-        market_trends = self.analyze_market_trends(sales_data)
+        # 复用 analyze_consumption_patterns 刚由 sales_data 构建的立方体
+        market_trends = self.analyze_market_trends()
         
         report = {
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -1,67 +1,118 @@
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
 from typing import Dict, List, Tuple, Optional
 import logging
 from datetime import datetime, timedelta
+from .feature_engine import FeatureEngine, FeatureSpec
+from .online_features import OnlineFeatureState
+from .model_registry import PersistableModel
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DisasterWarningModel:
+# 分组计算滚动特征时使用的序列键
+WEATHER_SERIES_KEYS = ('location',)
+PEST_SERIES_KEYS = ('location', 'crop_type')
+# 极端天气判定分位数：气温低于5%或高于95%分位、降雨量高于90%分位
+EXTREME_TEMP_QUANTILES = (0.05, 0.95)
+HEAVY_RAIN_QUANTILE = 0.9
+# 风险等级，依次对应 risk_thresholds 的 low/medium/high 划分出的区间
+RISK_LEVELS = ('安全', '低风险', '中风险', '高风险')
+
+
+def _weather_feature_spec() -> FeatureSpec:
+    """天气特征规格：气象变化量和3/7/15日窗口统计"""
+    spec = FeatureSpec()
+    spec.add('temp_change', 'diff', 'temperature', 1)
+    spec.add('humidity_change', 'diff', 'humidity', 1)
+    spec.add('pressure_change', 'diff', 'pressure', 1)
+    for window in [3, 7, 15]:
+        spec.rolling('temperature', [window], prefix='temp')
+        spec.rolling('humidity', [window])
+        spec.rolling('rainfall', [window], stat='sum')
+    return spec
+
+
+def _pest_feature_spec() -> FeatureSpec:
+    """病虫害特征规格：30日历史发生率"""
+    return FeatureSpec().add('historical_occurrence', 'mean', 'pest_occurrence', 30)
+
+
+class DisasterWarningModel(PersistableModel):
+    persistent_attributes = (
+        'weather_model', 'pest_model', 'scaler', 'risk_thresholds', 'weather_thresholds',
+        'weather_feature_columns', 'pest_feature_columns'
+    )
+
     def __init__(self):
+        from sklearn.preprocessing import StandardScaler
+
         self.weather_model = None
         self.pest_model = None
         self.scaler = StandardScaler()
+        self.weather_feature_columns = []
+        self.pest_feature_columns = []
+        self.weather_engine = FeatureEngine(_weather_feature_spec())
+        self.pest_engine = FeatureEngine(_pest_feature_spec())
         self.risk_thresholds = {
             'low': 0.3,
             'medium': 0.6,
             'high': 0.8
         }
+        # 训练时确定的极端天气阈值，流式评分时沿用
+        self.weather_thresholds = {}
         
     def prepare_weather_features(self, data: pd.DataFrame) -> pd.DataFrame:
         """准备天气相关特征"""
-        features = data.copy()
+        # 气象变化量和移动统计按地区分组一次性计算
+        features = self.weather_engine.transform_frame(data, group_keys=WEATHER_SERIES_KEYS)
         
-        # 添加气象特征
-        features['temp_change'] = features['temperature'].diff()
-        features['humidity_change'] = features['humidity'].diff()
-        features['pressure_change'] = features['pressure'].diff()
+        # 添加极端天气指标，阈值优先使用训练时确定的值
+        thresholds = self.weather_thresholds or self._fit_weather_thresholds(data)
+        features['extreme_temp'], features['heavy_rain'] = self._extreme_weather_flags(data, thresholds)
         
-        # 计算移动平均
-        for window in [3, 7, 15]:
-            features[f'temp_ma_{window}'] = features['temperature'].rolling(window=window).mean()
-            features[f'humidity_ma_{window}'] = features['humidity'].rolling(window=window).mean()
-            features[f'rainfall_ma_{window}'] = features['rainfall'].rolling(window=window).sum()
-            
-        # 添加极端天气指标
-        features['extreme_temp'] = (features['temperature'] > features['temperature'].quantile(0.95)) | \
-                                 (features['temperature'] < features['temperature'].quantile(0.05))
-        features['heavy_rain'] = features['rainfall'] > features['rainfall'].quantile(0.9)
-        
-        return features.dropna()
+        return pd.concat([data, features], axis=1).dropna()
+    
+    def _fit_weather_thresholds(self, data: pd.DataFrame) -> Dict[str, float]:
+        """由数据分位数确定极端气温和强降雨阈值"""
+        temp_low, temp_high = np.nanquantile(data['temperature'].to_numpy(), EXTREME_TEMP_QUANTILES)
+        return {
+            'temp_low': float(temp_low),
+            'temp_high': float(temp_high),
+            'heavy_rain': float(np.nanquantile(data['rainfall'].to_numpy(), HEAVY_RAIN_QUANTILE))
+        }
+    
+    def _extreme_weather_flags(self, data: pd.DataFrame,
+                               thresholds: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """极端气温和强降雨标记"""
+        temperature = data['temperature'].to_numpy()
+        extreme_temp = (temperature > thresholds['temp_high']) | (temperature < thresholds['temp_low'])
+        heavy_rain = data['rainfall'].to_numpy() > thresholds['heavy_rain']
+        return extreme_temp, heavy_rain
     
     def prepare_pest_features(self, data: pd.DataFrame) -> pd.DataFrame:
         """准备病虫害相关特征"""
-        features = data.copy()
+        # 添加历史发生率
+        features = self.pest_engine.transform_frame(data, group_keys=PEST_SERIES_KEYS)
         
         # 添加环境条件特征
-        features['temp_humidity_index'] = features['temperature'] * features['humidity']
-        features['optimal_pest_conditions'] = ((features['temperature'] >= 20) & 
-                                             (features['temperature'] <= 30) & 
-                                             (features['humidity'] >= 60))
-        
-        # 添加历史发生率
-        features['historical_occurrence'] = features['pest_occurrence'].rolling(window=30).mean()
+        temperature = data['temperature'].to_numpy()
+        humidity = data['humidity'].to_numpy()
+        features['temp_humidity_index'] = (temperature * humidity).astype(np.float32)
+        features['optimal_pest_conditions'] = ((temperature >= 20) &
+                                               (temperature <= 30) &
+                                               (humidity >= 60))
         
-        return features.dropna()
+        return pd.concat([data, features], axis=1).dropna()
     
     def train_weather_model(self, data: pd.DataFrame):
         """训练天气灾害预测模型"""
+        from sklearn.ensemble import RandomForestClassifier
+
+        self.weather_thresholds = self._fit_weather_thresholds(data)
         features = self.prepare_weather_features(data)
         X = features.drop(['disaster_occurrence', 'date'], axis=1)
         y = features['disaster_occurrence']
+        self.weather_feature_columns = X.columns.tolist()
         
         self.weather_model = RandomForestClassifier(
             n_estimators=100,
@@ -73,9 +124,12 @@ class DisasterWarningModel:
         
     def train_pest_model(self, data: pd.DataFrame):
         """训练病虫害预测模型"""
+        from sklearn.ensemble import RandomForestClassifier
+
         features = self.prepare_pest_features(data)
         X = features.drop(['pest_occurrence', 'date'], axis=1)
         y = features['pest_occurrence']
+        self.pest_feature_columns = X.columns.tolist()
         
         self.pest_model = RandomForestClassifier(
             n_estimators=100,
@@ -101,13 +155,27 @@ class DisasterWarningModel:
     
     def calculate_risk_level(self, probability: float) -> str:
         """根据概率确定风险等级"""
-        if probability >= self.risk_thresholds['high']:
-            return '高风险'
-        elif probability >= self.risk_thresholds['medium']:
-            return '中风险'
-        elif probability >= self.risk_thresholds['low']:
-            return '低风险'
-        return '安全'
+        return str(self.calculate_risk_levels(np.array([probability]))[0])
+    
+    def calculate_risk_levels(self, probabilities: np.ndarray) -> np.ndarray:
+        """批量确定风险等级，缺失概率视为安全"""
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        bins = [self.risk_thresholds['low'], self.risk_thresholds['medium'], self.risk_thresholds['high']]
+        levels = np.digitize(probabilities, bins)
+        levels[np.isnan(probabilities)] = 0
+        return np.asarray(RISK_LEVELS, dtype=object)[levels]
+    
+    def create_risk_stream(self, history: Optional[pd.DataFrame] = None,
+                           alert_level: str = '中风险') -> 'WeatherRiskStream':
+        """创建流式天气风险评分服务，可用历史观测预热各地区的滚动窗口"""
+        if self.weather_model is None:
+            raise ValueError("天气模型未训练")
+        spec = self.weather_engine.spec
+        if history is None:
+            state = OnlineFeatureState(spec, WEATHER_SERIES_KEYS)
+        else:
+            state = OnlineFeatureState.from_history(spec, history, WEATHER_SERIES_KEYS)
+        return WeatherRiskStream(self, state, alert_level)
     
     def generate_warning_report(self, weather_data: pd.DataFrame, pest_data: pd.DataFrame) -> Dict:
         """生成灾害预警报告"""
@@ -163,4 +231,79 @@ class DisasterWarningModel:
                 "关注病虫害发展趋势"
             ])
             
-        return recommendations 
\ No newline at end of file
+        return recommendations
+
+
+class WeatherRiskStream:
+    """流式天气灾害风险评分
+
+    按地区维护 3/7/15 日滚动窗口的增量状态，每批新观测只更新状态、计算这一批
+    的特征并整体预测，延迟只取决于批大小，与历史长度无关。极端天气阈值使用
+    训练时确定的值。
+    """
+
+    def __init__(self, model: DisasterWarningModel, state: OnlineFeatureState, alert_level: str = '中风险'):
+        if alert_level not in RISK_LEVELS:
+            raise ValueError(f"未知的风险等级: {alert_level}，可选: {list(RISK_LEVELS)}")
+        self.model = model
+        self.state = state
+        self.alert_level = alert_level
+
+    def score_batch(self, observations: pd.DataFrame) -> pd.DataFrame:
+        """为一批新观测评分，返回每条观测的风险概率和等级（索引与输入一致）
+
+        同一地区的观测按日期顺序写入状态；日期不晚于该地区最新观测的记录（重复或
+        迟到的观测）被跳过、不写入状态。滚动窗口尚不完整或被跳过的观测概率为 NaN。
+        """
+        model = self.model
+        columns = model.weather_feature_columns
+        batch = observations.assign(date=pd.to_datetime(observations['date']))
+        batch = batch.sort_values([*WEATHER_SERIES_KEYS, 'date'], kind='mergesort')
+
+        rows = []
+        skipped = 0
+        sources = batch[self.state.sources].to_numpy(dtype=np.float64)
+        keys = batch[list(WEATHER_SERIES_KEYS)].itertuples(index=False, name=None)
+        for key, when, values in zip(keys, batch['date'], sources):
+            latest = self.state.last_date(key)
+            if pd.isna(when) or (latest is not None and when <= latest):
+                rows.append({})
+                skipped += 1
+                continue
+            self.state.update(key, when, **dict(zip(self.state.sources, values)))
+            rows.append(self.state.features(key))
+        if skipped:
+            logger.warning(f"跳过{skipped}条日期缺失或不晚于地区最新观测的记录")
+        features = pd.DataFrame(rows, index=batch.index)
+        thresholds = model.weather_thresholds or model._fit_weather_thresholds(batch)
+        features['extreme_temp'], features['heavy_rain'] = model._extreme_weather_flags(batch, thresholds)
+        features = pd.concat([batch.drop(columns=features.columns, errors='ignore'), features], axis=1)
+
+        X = features.reindex(columns=columns)
+        complete = X.notna().all(axis=1).to_numpy()
+        probability = np.full(len(X), np.nan)
+        if complete.any():
+            probability[complete] = model.predict_weather_risk(X[complete])
+
+        scored = pd.DataFrame({
+            'location': batch['location'],
+            'date': batch['date'],
+            'probability': probability,
+            'risk_level': model.calculate_risk_levels(probability)
+        }, index=batch.index)
+        return scored.reindex(observations.index)
+
+    def alerts(self, scored: pd.DataFrame) -> pd.DataFrame:
+        """按地区汇总达到 alert_level 的预警：每个地区取概率最高的一条观测"""
+        threshold = RISK_LEVELS.index(self.alert_level)
+        rank = pd.Series(scored['risk_level']).map({level: i for i, level in enumerate(RISK_LEVELS)})
+        flagged = scored[rank >= threshold]
+        if flagged.empty:
+            return flagged.reset_index(drop=True)
+        worst = flagged.sort_values(['probability', 'date'], ascending=[False, False], kind='mergesort')
+        return worst.drop_duplicates('location').sort_values('location').reset_index(drop=True)
+
+    def process(self, observations: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """评分一批观测并返回（评分结果, 分地区预警）"""
+        scored = self.score_batch(observations)
+        return scored, self.alerts(scored)
\ No newline at end of file
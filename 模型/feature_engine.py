@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 支持的日历特征
+CALENDAR_PARTS = ('year', 'month', 'quarter', 'day', 'dayofweek', 'dayofyear')
+# 支持的序列算子
+SERIES_OPS = ('lag', 'diff', 'mean', 'std', 'sum')
+
+
+class FeatureSpec:
+    """声明式特征规格
+
+    每个特征由 (名称, 算子, 源列, 参数) 描述，算子为 lag/diff/mean/std/sum，
+    参数为滞后阶数或窗口长度。日历特征单独登记。
+    """
+
+    def __init__(self):
+        self.features: List[Tuple[str, str, str, int]] = []
+        self.calendar_parts: List[str] = []
+
+    def add(self, name: str, op: str, column: str, param: int) -> 'FeatureSpec':
+        """登记单个特征"""
+        if op not in SERIES_OPS:
+            raise ValueError(f"不支持的特征算子: {op}")
+        if param < 1:
+            raise ValueError(f"特征{name}的参数必须为正整数")
+        self.features.append((name, op, column, int(param)))
+        return self
+
+    def lags(self, column: str, lags: Sequence[int], prefix: Optional[str] = None) -> 'FeatureSpec':
+        """登记滞后特征，命名为 {prefix}_lag_{lag}"""
+        for lag in lags:
+            self.add(f'{prefix or column}_lag_{lag}', 'lag', column, lag)
+        return self
+
+    def rolling(self, column: str, windows: Sequence[int], stat: str = 'mean',
+                prefix: Optional[str] = None, tag: str = 'ma') -> 'FeatureSpec':
+        """登记滚动窗口特征，命名为 {prefix}_{tag}_{window}"""
+        for window in windows:
+            self.add(f'{prefix or column}_{tag}_{window}', stat, column, window)
+        return self
+
+    def diffs(self, column: str, periods: Sequence[int] = (1,), prefix: Optional[str] = None) -> 'FeatureSpec':
+        """登记差分特征，命名为 {prefix}_diff_{period}"""
+        for period in periods:
+            self.add(f'{prefix or column}_diff_{period}', 'diff', column, period)
+        return self
+
+    def calendar(self, *parts: str) -> 'FeatureSpec':
+        """登记日历特征"""
+        for part in parts:
+            if part not in CALENDAR_PARTS:
+                raise ValueError(f"不支持的日历特征: {part}")
+            self.calendar_parts.append(part)
+        return self
+
+    @property
+    def columns(self) -> List[str]:
+        """输出特征列顺序：日历特征在前，序列特征在后"""
+        return self.calendar_parts + [feature[0] for feature in self.features]
+
+    @property
+    def source_columns(self) -> List[str]:
+        """特征依赖的源列"""
+        return list(dict.fromkeys(feature[2] for feature in self.features))
+
+    @property
+    def max_lookback(self) -> int:
+        """计算全部特征所需的最长历史长度"""
+        lookbacks = [
+            param if op in ('lag', 'diff') else param - 1
+            for _, op, _, param in self.features
+        ]
+        return max(lookbacks, default=0)
+
+
+class FeatureEngine:
+    """向量化、按序列分组的特征计算引擎
+
+    一次分组排序后在连续的 NumPy 缓冲区上计算全部特征，
+    结果写入单个 float64 矩阵，行顺序与输入一致。
+    """
+
+    def __init__(self, spec: FeatureSpec):
+        self.spec = spec
+
+    def transform(self, data: pd.DataFrame, group_keys: Sequence[str] = (),
+                  date_col: str = 'date') -> Tuple[np.ndarray, List[str]]:
+        """计算特征矩阵
+
+        group_keys 中不存在于 data 的列会被忽略；存在日期列时序列内按日期排序，
+        滚动窗口和滞后不会跨越序列边界。
+        """
+        n = len(data)
+        columns = self.spec.columns
+        block = np.empty((n, len(columns)), dtype=np.float64)
+        if n == 0:
+            return block, columns
+
+        group_keys = [key for key in group_keys if key in data.columns]
+        if group_keys:
+            codes = data.groupby(group_keys, sort=False).ngroup().to_numpy()
+        else:
+            codes = np.zeros(n, dtype=np.int64)
+
+        dates = pd.to_datetime(data[date_col]) if date_col in data.columns else None
+        if dates is not None:
+            order = np.lexsort((dates.to_numpy(), codes))
+        else:
+            order = np.argsort(codes, kind='stable')
+
+        # 每行在所属序列内的位置
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        lengths = np.diff(np.r_[starts, n])
+        position = np.arange(n) - np.repeat(starts, lengths)
+
+        for j, part in enumerate(self.spec.calendar_parts):
+            if dates is None:
+                raise ValueError(f"缺少日期列{date_col}，无法生成日历特征")
+            block[:, j] = getattr(dates.dt, part).to_numpy()
+
+        offset = len(self.spec.calendar_parts)
+        buffers = {
+            column: np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)[order])
+            for column in self.spec.source_columns
+        }
+        for j, (_, op, column, param) in enumerate(self.spec.features, start=offset):
+            block[order, j] = _compute_series_op(buffers[column], position, op, param)
+
+        return block, columns
+
+    def transform_frame(self, data: pd.DataFrame, group_keys: Sequence[str] = (),
+                        date_col: str = 'date') -> pd.DataFrame:
+        """计算特征并以 DataFrame 形式返回，索引与输入一致
+
+        滞后和差分列保持 float64 以免截断较大的价格，日历和滚动统计列为 float32。
+        """
+        block, columns = self.transform(data, group_keys, date_col)
+        exact = {name for name, op, _, _ in self.spec.features if op in ('lag', 'diff')}
+        return pd.DataFrame({
+            column: block[:, j] if column in exact else block[:, j].astype(np.float32)
+            for j, column in enumerate(columns)
+        }, index=data.index)
+
+
+def _compute_series_op(values: np.ndarray, position: np.ndarray, op: str, param: int) -> np.ndarray:
+    """在按序列排好序的缓冲区上计算单个特征"""
+    if op in ('lag', 'diff'):
+        shifted = np.full_like(values, np.nan)
+        shifted[param:] = values[:-param]
+        shifted[position < param] = np.nan
+        return shifted if op == 'lag' else values - shifted
+    return _rolling_stat(values, position, param, op)
+
+
+def _rolling_stat(values: np.ndarray, position: np.ndarray, window: int, stat: str) -> np.ndarray:
+    """基于累积和的滚动统计，窗口内含缺失值或历史不足时返回 NaN
+
+    每个序列按自身均值中心化，累积和在序列起点归零，长面板数据中各序列的
+    误差互不累积。
+    """
+    n = len(values)
+    missing = np.isnan(values)
+    starts = np.flatnonzero(position == 0)
+    lengths = np.diff(np.r_[starts, n])
+    observed = np.add.reduceat(~missing, starts)
+    sums = np.add.reduceat(np.where(missing, 0.0, values), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centre = np.repeat(np.where(observed > 0, sums / np.maximum(observed, 1), 0.0), lengths)
+    centred = np.where(missing, 0.0, values - centre)
+
+    upper = np.arange(1, n + 1)
+    lower = np.maximum(upper - window, 0)
+    cmiss = np.concatenate(([0], np.cumsum(missing)))
+    total = _segment_window_sum(centred, starts, lengths, upper, lower)
+    valid = (position >= window - 1) & (cmiss[upper] == cmiss[lower])
+
+    if stat == 'sum':
+        result = total + centre * window
+    elif stat == 'mean':
+        result = total / window + centre
+    else:
+        squares = _segment_window_sum(centred ** 2, starts, lengths, upper, lower)
+        variance = np.maximum(squares - total ** 2 / window, 0.0) / max(window - 1, 1)
+        result = np.sqrt(variance) if window > 1 else np.full(n, np.nan)
+
+    result[~valid] = np.nan
+    return result
+
+
+def _segment_window_sum(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray,
+                        upper: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """窗口和：每个序列单独累积，累积和在序列起点归零"""
+    segment = np.repeat(np.arange(len(starts)), lengths)
+    local = np.concatenate(([0.0], pd.Series(values).groupby(segment).cumsum().to_numpy()))
+    # 窗口下界落在序列起点时，对应的局部累积值为 0
+    before = np.where(lower > np.repeat(starts, lengths), local[lower], 0.0)
+    return local[upper] - before
\ No newline at end of file
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 地球平均半径（千米）
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _to_radians(latitudes, longitudes) -> np.ndarray:
+    """经纬度（度）转换为 BallTree 使用的 (纬度, 经度) 弧度数组"""
+    return np.radians(np.column_stack([
+        np.asarray(latitudes, dtype=np.float64),
+        np.asarray(longitudes, dtype=np.float64)
+    ]))
+
+
+class HaversineDBSCAN:
+    """基于球面距离的分块 DBSCAN 聚类
+
+    以 haversine 距离的 BallTree 为索引，eps 以千米计。邻域查询按块进行，
+    核心点之间的连通关系每块合并一次，内存占用与块大小而非总点数成正比。
+    边界点归入最近核心点所在的簇，噪声点标记为 -1。
+    """
+
+    def __init__(self, eps_km: float = 5.0, min_samples: int = 5, chunk_size: int = 20000):
+        if eps_km <= 0:
+            raise ValueError("eps_km必须为正数")
+        self.eps_km = eps_km
+        self.min_samples = min_samples
+        self.chunk_size = chunk_size
+        self.core_tree = None
+        self.core_labels = None
+        self.labels_ = None
+
+    @property
+    def _radius(self) -> float:
+        return self.eps_km / EARTH_RADIUS_KM
+
+    def _chunks(self, n: int):
+        for start in range(0, n, self.chunk_size):
+            yield start, min(start + self.chunk_size, n)
+
+    def fit(self, latitudes, longitudes) -> 'HaversineDBSCAN':
+        """对经纬度点聚类"""
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        from sklearn.neighbors import BallTree
+
+        points = _to_radians(latitudes, longitudes)
+        n = len(points)
+        tree = BallTree(points, metric='haversine')
+
+        # 核心点：eps 邻域内（含自身）不少于 min_samples 个点
+        counts = np.empty(n, dtype=np.int64)
+        for start, end in self._chunks(n):
+            counts[start:end] = tree.query_radius(points[start:end], self._radius, count_only=True)
+        core = np.flatnonzero(counts >= self.min_samples)
+        labels = np.full(n, -1, dtype=np.int64)
+        if core.size == 0:
+            self.core_tree, self.core_labels, self.labels_ = None, np.empty(0, dtype=np.int64), labels
+            return self
+
+        # 逐块合并核心点之间的连通关系
+        core_points = points[core]
+        core_tree = BallTree(core_points, metric='haversine')
+        component = np.arange(core.size)
+        for start, end in self._chunks(core.size):
+            neighbors = core_tree.query_radius(core_points[start:end], self._radius)
+            sizes = np.fromiter((len(items) for items in neighbors), dtype=np.int64, count=end - start)
+            source = np.repeat(np.arange(start, end), sizes)
+            target = np.concatenate(neighbors) if sizes.sum() else np.empty(0, dtype=np.int64)
+            graph = coo_matrix(
+                (np.ones(source.size + core.size), (np.r_[component[source], component], np.r_[component[target], component])),
+                shape=(core.size, core.size)
+            )
+            _, merged = connected_components(graph, directed=False)
+            component = merged[component]
+
+        core_labels = pd.factorize(component)[0].astype(np.int64)
+        labels[core] = core_labels
+
+        # 边界点归入 eps 范围内最近核心点所在的簇
+        border = np.setdiff1d(np.arange(n), core, assume_unique=True)
+        for start, end in self._chunks(border.size):
+            distance, nearest = core_tree.query(points[border[start:end]], k=1)
+            within = distance[:, 0] <= self._radius
+            labels[border[start:end][within]] = core_labels[nearest[within, 0]]
+
+        self.core_tree = core_tree
+        self.core_labels = core_labels
+        self.labels_ = labels
+        logger.info(f"聚类完成: {core_labels.max() + 1}个簇, {int((labels == -1).sum())}个噪声点")
+        return self
+
+    def predict(self, latitudes, longitudes) -> np.ndarray:
+        """把新点分配到 eps 范围内最近核心点所在的簇，无需重新拟合"""
+        points = _to_radians(latitudes, longitudes)
+        labels = np.full(len(points), -1, dtype=np.int64)
+        if self.core_tree is None:
+            if self.labels_ is None:
+                raise ValueError("模型未训练")
+            return labels
+        for start, end in self._chunks(len(points)):
+            distance, nearest = self.core_tree.query(points[start:end], k=1)
+            within = distance[:, 0] <= self._radius
+            labels[start:end][within] = self.core_labels[nearest[within, 0]]
+        return labels
\ No newline at end of file
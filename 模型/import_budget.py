@@ -0,0 +1,87 @@
+import json
+import os
+import pkgutil
+import subprocess
+import sys
+from typing import Dict, List, Optional, Sequence
+
+# 需要保持快速导入的模块
+MODEL_MODULES = (
+    'market_analysis',
+    'disaster_warning',
+    'resource_planning',
+    'supply_chain',
+    'policy_analysis',
+    'consumer_behavior'
+)
+# 导入模型模块时不应被加载的重量级依赖
+HEAVY_MODULES = (
+    'prophet', 'xgboost', 'statsmodels', 'geopandas', 'networkx',
+    'textblob', 'jieba', 'sklearn', 'scipy', 'joblib'
+)
+# 在 numpy/pandas 之外每个模块允许的导入耗时（秒）
+DEFAULT_BUDGET_SECONDS = 0.2
+
+_PROBE = """
+import importlib, json, sys, time
+import numpy, pandas
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - started
+heavy = [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+print(json.dumps({'seconds': elapsed, 'heavy_modules': heavy}))
+"""
+
+
+def package_modules() -> List[str]:
+    """包内全部模块（含模型模块和各辅助模块）"""
+    return sorted(info.name for info in pkgutil.iter_modules([os.path.dirname(os.path.abspath(__file__))]))
+
+
+def measure_import(module: str, runs: int = 3) -> Dict:
+    """在干净的子进程中测量单个模块的导入耗时（取多次运行的最小值）"""
+    package = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    measurements = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE, f'{package}.{module}', json.dumps(HEAVY_MODULES)],
+            cwd=root, capture_output=True, text=True, check=True
+        ).stdout
+        measurements.append(json.loads(output.strip().splitlines()[-1]))
+    best = min(measurements, key=lambda item: item['seconds'])
+    return {'module': module, 'seconds': best['seconds'], 'heavy_modules': best['heavy_modules']}
+
+
+def check_import_budget(modules: Optional[Sequence[str]] = None,
+                        budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+                        runs: int = 3) -> List[Dict]:
+    """检查各模块（默认为包内全部模块）的导入耗时和重量级依赖，超出预算时抛出 AssertionError"""
+    modules = package_modules() if modules is None else modules
+    results = [measure_import(module, runs) for module in modules]
+    violations = [
+        f"{item['module']}: {item['seconds']:.3f}秒，加载了{item['heavy_modules']}"
+        for item in results
+        if item['seconds'] > budget_seconds or item['heavy_modules']
+    ]
+    if violations:
+        raise AssertionError("模块导入超出预算：\n" + "\n".join(violations))
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """命令行入口：python -m 模型.import_budget [预算秒数]"""
+    argv = sys.argv[1:] if argv is None else argv
+    budget = float(argv[0]) if argv else DEFAULT_BUDGET_SECONDS
+    try:
+        results = check_import_budget(budget_seconds=budget)
+    except AssertionError as error:
+        print(error)
+        return 1
+    for item in results:
+        print(f"{item['module']:<20}{item['seconds'] * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
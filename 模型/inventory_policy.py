@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Optional, Sequence, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 库存策略的默认分组键
+INVENTORY_KEYS = ('warehouse', 'sku')
+DEFAULT_SERVICE_LEVEL = 0.95
+# 固定订货成本
+DEFAULT_ORDER_COST = 100.0
+DAYS_PER_YEAR = 365
+
+# 分组参数：标量、按分组键（或更细粒度的键）索引的 Series，或数据中的列名（取组内均值）
+GroupParameter = Union[float, pd.Series, str]
+
+
+def _group_parameter(value: GroupParameter, data: pd.DataFrame, keys: List[str],
+                     index: pd.Index, name: str) -> np.ndarray:
+    """把标量/Series/列名形式的参数展开为与分组顺序一致的数组"""
+    if isinstance(value, str):
+        value = data.groupby(keys, sort=True)[value].mean()
+    if isinstance(value, pd.Series):
+        names = list(value.index.names)
+        if names != keys and set(keys) <= set(names):
+            # 更细粒度的参数（如按仓库-SKU）先在分组内取均值
+            value = value.groupby(level=keys).mean()
+        aligned = value.reindex(index)
+        if aligned.isna().any():
+            raise ValueError(f"参数{name}缺少{int(aligned.isna().sum())}个分组的取值")
+        return aligned.to_numpy(dtype=np.float64)
+    return np.full(len(index), float(value))
+
+
+def compute_inventory_policies(data: pd.DataFrame, keys: Sequence[str] = INVENTORY_KEYS,
+                               service_level: GroupParameter = DEFAULT_SERVICE_LEVEL,
+                               order_cost: GroupParameter = DEFAULT_ORDER_COST) -> pd.DataFrame:
+    """向量化计算每个分组的安全库存、经济订货量和再订货点
+
+    keys 中不存在于 data 的列会被忽略；服务水平和订货成本可以按分组单独配置。
+    返回每个分组一行的 DataFrame，分组键为普通列。
+    """
+    from scipy.special import ndtri
+
+    keys = [key for key in keys if key in data.columns]
+    if not keys:
+        raise ValueError(f"数据中缺少分组列: {list(INVENTORY_KEYS)}")
+
+    stats = data.groupby(keys, sort=True).agg(
+        demand_mean=('demand', 'mean'),
+        demand_std=('demand', 'std'),
+        lead_time=('lead_time', 'mean'),
+        lead_time_std=('lead_time', 'std'),
+        storage_cost=('storage_cost', 'mean')
+    )
+    levels = _group_parameter(service_level, data, keys, stats.index, 'service_level')
+    if ((levels <= 0) | (levels >= 1)).any():
+        raise ValueError("服务水平必须位于(0, 1)区间")
+    costs = _group_parameter(order_cost, data, keys, stats.index, 'order_cost')
+
+    demand_mean = stats['demand_mean'].to_numpy()
+    demand_std = stats['demand_std'].to_numpy()
+    lead_time = stats['lead_time'].to_numpy()
+    z_score = ndtri(levels)
+
+    # 安全库存
+    safety_stock = z_score * np.sqrt(lead_time * demand_std ** 2 + demand_mean ** 2 * lead_time)
+    # 经济订货量(EOQ)
+    annual_demand = demand_mean * DAYS_PER_YEAR
+    holding_cost = stats['storage_cost'].to_numpy() / DAYS_PER_YEAR
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eoq = np.sqrt(2 * annual_demand * costs / holding_cost)
+
+    return stats.assign(
+        service_level=levels,
+        z_score=z_score,
+        order_cost=costs,
+        safety_stock=safety_stock,
+        eoq=eoq,
+        reorder_point=safety_stock + demand_mean * lead_time,
+        max_inventory=safety_stock + eoq
+    ).reset_index()
\ No newline at end of file
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每个分片模拟的场景数；分片的随机种子由 SeedSequence 派生，结果与进程数无关
+DEFAULT_SHARD_SIZE = 250
+# 提前期抽样的截断范围（均值 + 若干倍标准差）
+LEAD_TIME_SIGMAS = 4.0
+
+
+def _simulate_shard(demand_mean: np.ndarray, demand_std: np.ndarray, lead_mean: np.ndarray,
+                    lead_std: np.ndarray, reorder_point: np.ndarray, order_qty: np.ndarray,
+                    group: np.ndarray, n_scenarios: int, horizon: int,
+                    seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    """模拟一个分片的 (s, Q) 库存策略，返回各策略的累计量
+
+    数组按 (场景, 策略) 组织；随机数按分组（仓库）抽取后映射到策略，
+    同一分组的不同候选策略共享需求和提前期样本（公共随机数）。
+    缺货部分视为销售损失。
+    """
+    rng = np.random.default_rng(seed)
+    n_groups = len(demand_mean)
+    n_policies = len(group)
+    max_lead = max(int(np.ceil((lead_mean + LEAD_TIME_SIGMAS * lead_std).max())), 1)
+    slots = max_lead + 1
+
+    on_hand = np.tile(reorder_point + order_qty, (n_scenarios, 1))
+    on_order = np.zeros((n_scenarios, n_policies))
+    # 在途订单按到货日所在的槽位存放，pipeline[slot] 为连续内存
+    pipeline = np.zeros((slots, n_scenarios, n_policies))
+    flat_pipeline = pipeline.reshape(-1)
+    cells = n_scenarios * n_policies
+
+    served_total = np.zeros(n_policies)
+    demand_total = np.zeros(n_policies)
+    stockout_days = np.zeros(n_policies)
+    on_hand_total = np.zeros(n_policies)
+    any_stockout = np.zeros((n_scenarios, n_policies), dtype=bool)
+
+    for day in range(horizon):
+        slot = day % slots
+        arriving = pipeline[slot].copy()
+        pipeline[slot] = 0.0
+        on_hand += arriving
+        on_order -= arriving
+
+        demand = np.maximum(demand_mean + demand_std * rng.standard_normal((n_scenarios, n_groups)), 0.0)[:, group]
+        lead = np.rint(lead_mean + lead_std * rng.standard_normal((n_scenarios, n_groups)))
+        lead = np.clip(lead, 1, max_lead).astype(np.int64)[:, group].ravel()
+
+        served = np.minimum(on_hand, demand)
+        stockout = demand > on_hand
+        on_hand -= served
+
+        served_total += served.sum(axis=0)
+        demand_total += demand.sum(axis=0)
+        stockout_days += stockout.sum(axis=0)
+        on_hand_total += on_hand.sum(axis=0)
+        any_stockout |= stockout
+
+        # 库存位置不高于再订货点时下单，订货量为 Q 的整数倍
+        position = (on_hand + on_order).ravel()
+        placing = np.flatnonzero(position <= np.tile(reorder_point, n_scenarios))
+        if placing.size:
+            policy = placing % n_policies
+            quantity = (np.floor((reorder_point[policy] - position[placing]) / order_qty[policy]) + 1) * order_qty[policy]
+            flat_pipeline[((day + lead[placing]) % slots) * cells + placing] += quantity
+            on_order.reshape(-1)[placing] += quantity
+
+    return {
+        'served': served_total,
+        'demand': demand_total,
+        'stockout_days': stockout_days,
+        'on_hand': on_hand_total,
+        'stockout_scenarios': any_stockout.sum(axis=0).astype(np.float64)
+    }
+
+
+def _run_simulation(groups: pd.DataFrame, group: np.ndarray, reorder_point: np.ndarray,
+                    order_qty: np.ndarray, n_scenarios: int, horizon: int, seed: int,
+                    n_jobs: int, shard_size: int) -> pd.DataFrame:
+    """按分片运行模拟并汇总指标"""
+    demand_mean = groups['demand_mean'].to_numpy(dtype=np.float64)
+    demand_std = np.nan_to_num(groups['demand_std'].to_numpy(dtype=np.float64))
+    lead_mean = groups['lead_time'].to_numpy(dtype=np.float64)
+    lead_std = np.nan_to_num(
+        groups['lead_time_std'].to_numpy(dtype=np.float64) if 'lead_time_std' in groups else np.zeros(len(groups))
+    )
+    if (order_qty <= 0).any() or not np.isfinite(order_qty).all():
+        raise ValueError("订货量必须为正的有限值")
+    # 缺失的再订货点会让比较恒为假、永不补货，需显式拒绝（常见于只有一条记录、标准差为空的分组）
+    for name, values in (('再订货点', reorder_point), ('平均需求', demand_mean), ('平均提前期', lead_mean)):
+        invalid = ~np.isfinite(values)
+        if invalid.any():
+            raise ValueError(f"{name}含{int(invalid.sum())}个缺失或非有限值，请检查各分组的样本数")
+
+    sizes = [min(shard_size, n_scenarios - start) for start in range(0, n_scenarios, shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    arguments = [
+        (demand_mean, demand_std, lead_mean, lead_std, reorder_point, order_qty, group, size, horizon, shard_seed)
+        for size, shard_seed in zip(sizes, seeds)
+    ]
+    if n_jobs > 1 and len(arguments) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            shards = list(executor.map(_simulate_shard, *zip(*arguments)))
+    else:
+        shards = [_simulate_shard(*args) for args in arguments]
+
+    totals = {name: sum(shard[name] for shard in shards) for name in shards[0]}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fill_rate = np.where(totals['demand'] > 0, totals['served'] / totals['demand'], 1.0)
+    scenario_days = n_scenarios * horizon
+    return pd.DataFrame({
+        'fill_rate': fill_rate,
+        'stockout_probability': totals['stockout_days'] / scenario_days,
+        'scenario_stockout_rate': totals['stockout_scenarios'] / n_scenarios,
+        'average_on_hand': totals['on_hand'] / scenario_days
+    })
+
+
+def simulate_inventory_policies(policies: pd.DataFrame, n_scenarios: int = 1000, horizon: int = 365,
+                                seed: int = 0, n_jobs: int = 1,
+                                shard_size: int = DEFAULT_SHARD_SIZE) -> pd.DataFrame:
+    """蒙特卡洛评估 (再订货点, 订货量) 策略的满足率和缺货概率
+
+    policies 为 compute_inventory_policies 的输出（或包含 demand_mean、demand_std、
+    lead_time、lead_time_std、reorder_point、eoq 列的同类表），每行一个分组。
+    需求按截断正态分布、提前期按取整的正态分布逐日抽样。
+    """
+    policies = policies.reset_index(drop=True)
+    metrics = _run_simulation(
+        policies, np.arange(len(policies)),
+        policies['reorder_point'].to_numpy(dtype=np.float64),
+        policies['eoq'].to_numpy(dtype=np.float64),
+        n_scenarios, horizon, seed, n_jobs, shard_size
+    )
+    return pd.concat([policies, metrics], axis=1)
+
+
+def search_reorder_points(policies: pd.DataFrame, target_fill_rate: float = 0.98,
+                          multipliers: Sequence[float] = tuple(np.linspace(0.0, 3.0, 13)),
+                          n_scenarios: int = 500, horizon: int = 365, seed: int = 0,
+                          n_jobs: int = 1, shard_size: int = DEFAULT_SHARD_SIZE) -> pd.DataFrame:
+    """为每个分组搜索达到目标满足率的最小再订货点
+
+    候选再订货点为提前期需求加安全库存的若干倍，全部候选在同一批模拟中评估
+    并共享随机样本，因此候选之间的比较不受抽样噪声影响。达不到目标时取最大候选。
+    """
+    policies = policies.reset_index(drop=True)
+    multipliers = np.sort(np.asarray(multipliers, dtype=np.float64))
+    n_groups, n_candidates = len(policies), len(multipliers)
+
+    lead_demand = (policies['demand_mean'] * policies['lead_time']).to_numpy(dtype=np.float64)
+    safety_stock = np.nan_to_num(policies['safety_stock'].to_numpy(dtype=np.float64))
+    # 候选按 (分组, 倍数) 展开
+    group = np.repeat(np.arange(n_groups), n_candidates)
+    candidates = (lead_demand[:, None] + safety_stock[:, None] * multipliers[None, :]).ravel()
+    order_qty = np.repeat(policies['eoq'].to_numpy(dtype=np.float64), n_candidates)
+
+    metrics = _run_simulation(policies, group, candidates, order_qty, n_scenarios, horizon,
+                              seed, n_jobs, shard_size)
+    fill_rate = metrics['fill_rate'].to_numpy().reshape(n_groups, n_candidates)
+    reached = fill_rate >= target_fill_rate
+    chosen = np.where(reached.any(axis=1), reached.argmax(axis=1), n_candidates - 1)
+    rows = np.arange(n_groups) * n_candidates + chosen
+
+    result = policies.assign(
+        safety_multiplier=multipliers[chosen],
+        reorder_point=candidates[rows],
+        max_inventory=candidates[rows] + policies['eoq'].to_numpy(),
+        target_reached=reached.any(axis=1)
+    )
+    return pd.concat([result, metrics.iloc[rows].reset_index(drop=True)], axis=1)
\ No newline at end of file
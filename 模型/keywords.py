@@ -0,0 +1,136 @@
+from collections import Counter
+from typing import Iterable, List, Sequence, Tuple
+import heapq
+import json
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10000
+# IDF 来源：jieba 自带的 IDF 词表，或由已处理评论的文档频率计算
+IDF_SOURCES = ('jieba', 'corpus')
+
+
+def _count_chunk(texts: Sequence[str]) -> Tuple[Counter, Counter, int]:
+    """对一个评论块分词，返回词频、文档频率和评论数"""
+    import jieba
+    import jieba.analyse
+
+    stop_words = jieba.analyse.default_tfidf.stop_words
+    term_counts = Counter()
+    document_counts = Counter()
+    for text in texts:
+        words = [
+            word for word in jieba.cut(text)
+            if len(word.strip()) >= 2 and word.lower() not in stop_words
+        ]
+        term_counts.update(words)
+        document_counts.update(set(words))
+    return term_counts, document_counts, len(texts)
+
+
+class IncrementalKeywordExtractor:
+    """增量 TF-IDF 关键词提取
+
+    逐块分词并合并词频和文档频率计数，不拼接全部评论；新评论到达时用
+    partial_fit 累加计数，top_k 用堆从词表中选出权重最高的关键词。
+    默认 idf='corpus' 由累计的文档频率计算 IDF；idf='jieba' 时与
+    jieba.analyse.extract_tags 的权重定义一致。
+    """
+
+    def __init__(self, idf: str = 'corpus', chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if idf not in IDF_SOURCES:
+            raise ValueError(f"未知的IDF来源: {idf}，可选: {list(IDF_SOURCES)}")
+        self.idf = idf
+        self.chunk_size = chunk_size
+        self.term_counts = Counter()
+        self.document_counts = Counter()
+        self.n_documents = 0
+
+    def _count(self, texts: Iterable[str], n_jobs: int = 1) -> Tuple[Counter, Counter, int]:
+        """分块统计一批评论的词频、文档频率和评论数"""
+        texts = [text for text in texts if isinstance(text, str) and text]
+        chunks = [texts[start:start + self.chunk_size] for start in range(0, len(texts), self.chunk_size)]
+        if n_jobs > 1 and len(chunks) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(_count_chunk, chunks))
+        else:
+            results = [_count_chunk(chunk) for chunk in chunks]
+
+        term_counts, document_counts, n_documents = Counter(), Counter(), 0
+        for chunk_terms, chunk_documents, chunk_n in results:
+            term_counts.update(chunk_terms)
+            document_counts.update(chunk_documents)
+            n_documents += chunk_n
+        return term_counts, document_counts, n_documents
+
+    def _merge(self, term_counts: Counter, document_counts: Counter, n_documents: int):
+        self.term_counts.update(term_counts)
+        self.document_counts.update(document_counts)
+        self.n_documents += n_documents
+
+    def partial_fit(self, texts: Iterable[str], n_jobs: int = 1) -> 'IncrementalKeywordExtractor':
+        """累加一批评论的词频和文档频率"""
+        self._merge(*self._count(texts, n_jobs))
+        return self
+
+    def extract(self, texts: Iterable[str], k: int = 20, n_jobs: int = 1) -> List[Tuple[str, float]]:
+        """返回一批评论中权重最高的 k 个关键词，不修改累计计数
+
+        词频只取这批评论；IDF 使用累计的文档频率，尚无累计计数时使用这批评论自身的
+        文档频率。相同的累计计数下，同一批评论总得到相同的结果。
+        """
+        term_counts, document_counts, n_documents = self._count(texts, n_jobs)
+        if self.n_documents:
+            document_counts, n_documents = self.document_counts, self.n_documents
+        return self._rank(term_counts, k, document_counts, n_documents)
+
+    def _idf_function(self, document_counts: Counter, n_documents: int):
+        if self.idf == 'jieba':
+            import jieba.analyse
+
+            table = jieba.analyse.default_tfidf
+            idf_freq, median_idf = table.idf_freq, table.median_idf
+            return lambda word: idf_freq.get(word, median_idf)
+        return lambda word: math.log((n_documents + 1) / (document_counts[word] + 1)) + 1
+
+    def top_k(self, k: int = 20) -> List[Tuple[str, float]]:
+        """返回累计词频下权重最高的 k 个关键词及权重"""
+        return self._rank(self.term_counts, k, self.document_counts, self.n_documents)
+
+    def _rank(self, term_counts: Counter, k: int, document_counts: Counter,
+              n_documents: int) -> List[Tuple[str, float]]:
+        total = sum(term_counts.values())
+        if total == 0:
+            return []
+        idf = self._idf_function(document_counts, n_documents)
+        weighted = ((word, count * idf(word) / total) for word, count in term_counts.items())
+        return heapq.nlargest(k, weighted, key=lambda item: item[1])
+
+    def save(self, path: str):
+        """保存词频和文档频率表"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'idf': self.idf,
+                'n_documents': self.n_documents,
+                'term_counts': dict(self.term_counts),
+                'document_counts': dict(self.document_counts)
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> 'IncrementalKeywordExtractor':
+        """加载已保存的计数表"""
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        extractor = cls(state['idf'], chunk_size)
+        extractor.n_documents = state['n_documents']
+        extractor.term_counts = Counter(state['term_counts'])
+        extractor.document_counts = Counter(state['document_counts'])
+        return extractor
\ No newline at end of file
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 适宜性评分权重
+SUITABILITY_WEIGHTS = {
+    # 土壤评分：各养分指标的加权和
+    'soil': {
+        'organic_matter': 0.3,
+        'ph_value': 0.2,
+        'nitrogen_content': 0.2,
+        'phosphorus_content': 0.15,
+        'potassium_content': 0.15
+    },
+    # 地形评分：坡度、海拔为达标与否，排水条件为原值
+    'terrain': {
+        'slope': 0.4,
+        'elevation': 0.3,
+        'drainage_condition': 0.3
+    },
+    # 综合评分
+    'suitability': {
+        'soil_score': 0.6,
+        'terrain_score': 0.4
+    }
+}
+# 坡度（度）和海拔（米）的达标上限
+TERRAIN_LIMITS = {'slope': 15, 'elevation': 1000}
+HIGH_POTENTIAL_THRESHOLD = 0.8
+DEFAULT_CHUNKSIZE = 1_000_000
+
+# 输入源：文件路径、DataFrame，或列名到一维数组（可为 np.memmap）的映射
+LandSource = Union[str, pd.DataFrame, Mapping[str, np.ndarray]]
+
+
+def _merge_weights(weights: Optional[Dict]) -> Dict[str, Dict[str, float]]:
+    """用自定义权重覆盖默认权重"""
+    merged = {group: dict(values) for group, values in SUITABILITY_WEIGHTS.items()}
+    for group, values in (weights or {}).items():
+        if group not in merged:
+            raise ValueError(f"未知的权重分组: {group}")
+        merged[group].update(values)
+    return merged
+
+
+class SuitabilityAggregate:
+    """适宜性评分的流式汇总：均值、直方图和高潜力地块数量"""
+
+    def __init__(self, bins: Sequence[float], threshold: float):
+        self.bins = np.asarray(bins, dtype=np.float64)
+        self.threshold = threshold
+        self.count = 0
+        self.total = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.high_potential = 0
+        self.histogram = np.zeros(len(self.bins) - 1, dtype=np.int64)
+        self.below = 0
+        self.above = 0
+
+    def update(self, scores: np.ndarray):
+        """累加一个块的综合评分"""
+        scores = scores[~np.isnan(scores)]
+        if scores.size == 0:
+            return
+        self.count += scores.size
+        self.total += float(scores.sum(dtype=np.float64))
+        self.minimum = min(self.minimum, float(scores.min()))
+        self.maximum = max(self.maximum, float(scores.max()))
+        self.high_potential += int((scores >= self.threshold).sum())
+        self.histogram += np.histogram(scores, bins=self.bins)[0]
+        self.below += int((scores < self.bins[0]).sum())
+        self.above += int((scores > self.bins[-1]).sum())
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'average_score': self.total / self.count if self.count else float('nan'),
+            'min_score': self.minimum if self.count else float('nan'),
+            'max_score': self.maximum if self.count else float('nan'),
+            'high_potential_count': self.high_potential,
+            'histogram': {
+                'bins': self.bins.tolist(),
+                'counts': self.histogram.tolist(),
+                'below_range': self.below,
+                'above_range': self.above
+            }
+        }
+
+
+class SuitabilityScorer:
+    """分块计算土地适宜性评分
+
+    评分按块在 float32（或指定精度）下计算，不复制整张地块表；结果可逐块写出，
+    同时维护均值、直方图等汇总量。
+    """
+
+    def __init__(self, weights: Optional[Dict] = None, dtype=np.float32,
+                 threshold: float = HIGH_POTENTIAL_THRESHOLD,
+                 bins: Sequence[float] = tuple(np.linspace(0.0, 1.0, 21))):
+        self.weights = _merge_weights(weights)
+        self.dtype = dtype
+        self.threshold = threshold
+        self.bins = bins
+
+    @property
+    def input_columns(self) -> List[str]:
+        return list(self.weights['soil']) + list(self.weights['terrain'])
+
+    def score_arrays(self, columns: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """由各输入列计算三项评分"""
+        dtype = self.dtype
+        soil = np.zeros(len(columns[self.input_columns[0]]), dtype=dtype)
+        for column, weight in self.weights['soil'].items():
+            soil += np.asarray(columns[column], dtype=dtype) * dtype(weight)
+
+        terrain = np.zeros_like(soil)
+        for column, weight in self.weights['terrain'].items():
+            values = np.asarray(columns[column], dtype=dtype)
+            if column in TERRAIN_LIMITS:
+                values = (values <= TERRAIN_LIMITS[column]).astype(dtype)
+            terrain += values * dtype(weight)
+
+        combined = self.weights['suitability']
+        suitability = soil * dtype(combined['soil_score']) + terrain * dtype(combined['terrain_score'])
+        return {'soil_score': soil, 'terrain_score': terrain, 'suitability_score': suitability}
+
+    def score_frame(self, data: pd.DataFrame) -> pd.DataFrame:
+        """计算 DataFrame 的评分列，索引与输入一致"""
+        return pd.DataFrame(self.score_arrays(data), index=data.index)
+
+    @staticmethod
+    def source_columns(source: LandSource) -> List[str]:
+        """输入源的列名，只读取文件头或元数据"""
+        if isinstance(source, pd.DataFrame):
+            return list(source.columns)
+        if isinstance(source, str) and source.endswith('.parquet'):
+            import pyarrow.parquet as pq
+
+            return list(pq.read_schema(source).names)
+        if isinstance(source, str):
+            return list(pd.read_csv(source, nrows=0).columns)
+        return list(source)
+
+    def iter_chunks(self, source: LandSource, chunksize: int = DEFAULT_CHUNKSIZE,
+                    keep_columns: Sequence[str] = ()) -> Iterator[pd.DataFrame]:
+        """按块读取评分所需的列（以及 keep_columns），读取前先校验输入源的列"""
+        columns = list(dict.fromkeys(self.input_columns + list(keep_columns)))
+        available = set(self.source_columns(source))
+        missing = [column for column in columns if column not in available]
+        if missing:
+            raise ValueError(f"输入源缺少列: {missing}")
+        if isinstance(source, pd.DataFrame):
+            for start in range(0, len(source), chunksize):
+                yield source.iloc[start:start + chunksize][columns]
+        elif isinstance(source, str) and source.endswith('.parquet'):
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns):
+                yield batch.to_pandas()
+        elif isinstance(source, str):
+            yield from pd.read_csv(source, usecols=columns, chunksize=chunksize)
+        else:
+            # 列映射（例如 np.load(..., mmap_mode='r') 得到的数组）按切片读取
+            n = len(source[self.input_columns[0]])
+            for start in range(0, n, chunksize):
+                yield pd.DataFrame({column: np.asarray(source[column][start:start + chunksize]) for column in columns})
+
+    def score_stream(self, source: LandSource, output: Union[str, Callable, None] = None,
+                     chunksize: int = DEFAULT_CHUNKSIZE, keep_columns: Sequence[str] = ()) -> Dict:
+        """流式评分并返回汇总
+
+        output 为 .csv/.parquet 路径时逐块追加写出 keep_columns 和评分列，
+        为可调用对象时逐块传入结果 DataFrame。
+        """
+        aggregate = SuitabilityAggregate(self.bins, self.threshold)
+        writer = None
+        chunks = 0
+        try:
+            for chunk in self.iter_chunks(source, chunksize, keep_columns):
+                scores = self.score_arrays(chunk)
+                aggregate.update(scores['suitability_score'])
+                chunks += 1
+                if output is None:
+                    continue
+                result = chunk[list(keep_columns)].reset_index(drop=True).assign(**scores)
+                if callable(output):
+                    output(result)
+                elif output.endswith('.parquet'):
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+
+                    table = pa.Table.from_pandas(result, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(output, table.schema)
+                    writer.write_table(table)
+                else:
+                    result.to_csv(output, mode='w' if chunks == 1 else 'a', header=chunks == 1, index=False)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        summary = aggregate.to_dict()
+        summary['chunks'] = chunks
+        logger.info(f"完成{summary['count']}个地块的适宜性评分（{chunks}个数据块）")
+        return summary
\ No newline at end of file
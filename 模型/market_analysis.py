@@ -1,60 +1,174 @@
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from prophet import Prophet
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-import xgboost as xgb
 from typing import Dict, List, Tuple, Optional
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .feature_engine import FeatureEngine, FeatureSpec
+from .online_features import OnlineFeatureState
+from .forecasting import DemandForecaster, FourierForecaster, create_demand_forecaster, future_frame, FORECAST_COLUMNS
+from .model_registry import PersistableModel
+from .trend_cube import TrendCube
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class MarketAnalysisModel:
+# 多序列批量训练的默认序列键
+SERIES_KEYS = ('commodity', 'market')
+# 价格趋势立方体的度量
+PRICE_CUBE_MEASURES = ('price', 'demand')
+
+PRICE_MODEL_PARAMS = {
+    'n_estimators': 100,
+    'learning_rate': 0.1,
+    'max_depth': 5
+}
+
+
+def _price_feature_spec() -> FeatureSpec:
+    """价格模型特征规格：日历、滞后和移动平均"""
+    spec = FeatureSpec().calendar('year', 'month', 'quarter')
+    for lag in [1, 3, 6, 12]:
+        spec.lags('price', [lag]).lags('demand', [lag])
+    for window in [3, 6, 12]:
+        spec.rolling('price', [window]).rolling('demand', [window])
+    return spec
+
+
+def _fit_price_series(key: Tuple, X: np.ndarray, y: np.ndarray) -> Tuple[Tuple, object]:
+    """在子进程中训练单个序列的价格模型"""
+    import xgboost as xgb
+
+    # 每个进程只用一个线程，总并发由进程池大小控制
+    model = xgb.XGBRegressor(n_jobs=1, **PRICE_MODEL_PARAMS)
+    model.fit(X, y)
+    return key, model
+
+
+class MarketAnalysisModel(PersistableModel):
+    persistent_attributes = (
+        'price_model', 'demand_model', 'scaler', 'price_models', 'pooled_price_model',
+        'series_index', 'series_keys', 'batch_feature_columns', 'price_feature_columns',
+        'demand_forecaster', 'trend_cube'
+    )
+
     def __init__(self):
+        from sklearn.preprocessing import StandardScaler
+
         self.price_model = None
         self.demand_model = None
         self.scaler = StandardScaler()
+        self.feature_engine = FeatureEngine(_price_feature_spec())
+        # 多序列模型注册表：序列键 -> 价格模型
+        self.price_models = {}
+        self.pooled_price_model = None
+        self.series_index = {}
+        self.series_keys = SERIES_KEYS
+        self.batch_feature_columns = []
+        self.price_feature_columns = []
+        self.demand_forecaster = None
+        self.trend_cube = None
         
-    def prepare_features(self, data: pd.DataFrame) -> pd.DataFrame:
-        """准备特征工程"""
-        features = data.copy()
-        
-        # 添加时间特征
-        features['year'] = pd.to_datetime(features['date']).dt.year
-        features['month'] = pd.to_datetime(features['date']).dt.month
-        features['quarter'] = pd.to_datetime(features['date']).dt.quarter
-        
-        # 添加滞后特征
-        for lag in [1, 3, 6, 12]:
-            features[f'price_lag_{lag}'] = features['price'].shift(lag)
-            features[f'demand_lag_{lag}'] = features['demand'].shift(lag)
-            
-        # 添加移动平均
-        for window in [3, 6, 12]:
-            features[f'price_ma_{window}'] = features['price'].rolling(window=window).mean()
-            features[f'demand_ma_{window}'] = features['demand'].rolling(window=window).mean()
-            
-        return features.dropna()
+    def prepare_features(self, data: pd.DataFrame,
+                         keys: Tuple[str, ...] = SERIES_KEYS) -> pd.DataFrame:
+        """准备特征工程（存在序列键时按序列分组计算）"""
+        features = self.feature_engine.transform_frame(data, group_keys=keys)
+        return pd.concat([data, features], axis=1).dropna()
     
     def train_price_model(self, data: pd.DataFrame):
         """训练价格预测模型"""
+        import xgboost as xgb
+
         features = self.prepare_features(data)
         X = features.drop(['price', 'date', 'demand'], axis=1)
+        X = X.drop(columns=[key for key in SERIES_KEYS if key in X.columns])
         y = features['price']
+        self.price_feature_columns = X.columns.tolist()
         
-        self.price_model = xgb.XGBRegressor(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=5
-        )
+        self.price_model = xgb.XGBRegressor(**PRICE_MODEL_PARAMS)
         self.price_model.fit(X, y)
         logger.info("价格预测模型训练完成")
+
+    def prepare_batch_features(self, data: pd.DataFrame,
+                               keys: Tuple[str, ...] = SERIES_KEYS) -> pd.DataFrame:
+        """批量准备多序列特征，结果按序列键和日期排序"""
+        features = self.prepare_features(data, keys)
+        order = features[list(keys)].assign(date=pd.to_datetime(features['date'])).reset_index(drop=True)
+        return features.iloc[order.sort_values([*keys, 'date'], kind='mergesort').index]
+
+    def train_price_models_batch(self, data: pd.DataFrame,
+                                 keys: Tuple[str, ...] = SERIES_KEYS,
+                                 mode: str = 'per_series',
+                                 n_jobs: Optional[int] = None) -> Dict:
+        """批量训练多序列价格模型
+
+        mode='per_series' 时按序列键在进程池中并行训练独立模型，
+        mode='pooled' 时训练一个带序列编号特征的共享模型。
+        返回以序列键为索引的模型注册表。
+        """
+        import xgboost as xgb
+
+        keys = tuple(keys)
+        features = self.prepare_batch_features(data, keys)
+        group_ids = features.groupby(list(keys), sort=False).ngroup()
+        X = features.drop(['price', 'date', 'demand', *keys], axis=1)
+        y = features['price']
+
+        self.series_keys = keys
+        self.series_index = {
+            key if isinstance(key, tuple) else (key,): i
+            for i, key in enumerate(features.groupby(list(keys), sort=False).groups)
+        }
+        self.batch_feature_columns = X.columns.tolist()
+
+        if mode == 'pooled':
+            X = X.assign(series_id=group_ids.values)
+            self.pooled_price_model = xgb.XGBRegressor(**PRICE_MODEL_PARAMS)
+            self.pooled_price_model.fit(X, y)
+            self.price_models = {key: self.pooled_price_model for key in self.series_index}
+            logger.info(f"共享价格模型训练完成，共{len(self.series_index)}个序列")
+            return self.price_models
+
+        if mode != 'per_series':
+            raise ValueError(f"未知的训练模式: {mode}")
+
+        X_values = X.to_numpy(dtype=np.float32)
+        y_values = y.to_numpy(dtype=np.float32)
+        positions = np.argsort(group_ids.values, kind='stable')
+        bounds = np.flatnonzero(np.diff(group_ids.values[positions])) + 1
+        keys_by_id = list(self.series_index)
+
+        max_workers = n_jobs or os.cpu_count() or 1
+        self.price_models = {}
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _fit_price_series,
+                    keys_by_id[group_ids.values[rows[0]]],
+                    X_values[rows],
+                    y_values[rows]
+                )
+                for rows in np.split(positions, bounds)
+            ]
+            for future in futures:
+                key, model = future.result()
+                self.price_models[key] = model
+
+        logger.info(f"批量价格模型训练完成，共{len(self.price_models)}个序列")
+        return self.price_models
         
-    def train_demand_model(self, data: pd.DataFrame):
-        """训练需求预测模型"""
+    def train_demand_model(self, data: pd.DataFrame, backend: str = 'prophet'):
+        """训练需求预测模型
+
+        backend='prophet' 使用 Prophet；backend='fourier' 使用纯 NumPy 的傅里叶回归快速后端。
+        """
+        if backend == 'fourier':
+            self.demand_model = create_demand_forecaster(backend)
+            self.demand_model.fit_many(data)
+            logger.info("需求预测模型训练完成")
+            return
+
         # 使用Prophet模型进行需求预测
+        from prophet import Prophet
         df_prophet = data[['date', 'demand']].copy()
         df_prophet.columns = ['ds', 'y']
         
@@ -65,27 +179,97 @@ class MarketAnalysisModel:
         )
         self.demand_model.fit(df_prophet)
         logger.info("需求预测模型训练完成")
+
+    def train_demand_models_batch(self, data: pd.DataFrame,
+                                  keys: Tuple[str, ...] = SERIES_KEYS,
+                                  backend: str = 'prophet',
+                                  n_jobs: Optional[int] = None,
+                                  cache_dir: Optional[str] = None) -> Dict:
+        """批量训练多序列需求预测模型
+
+        Prophet 后端在进程池中并发拟合并复用数据未变化的已拟合模型，本次数据中
+        没有的序列不再保留；fourier 后端在一次批量线性代数运算中拟合全部序列。
+        """
+        if backend == 'prophet':
+            # 只有并发设置相同时才复用已有预测器（及其内存中的已拟合模型）
+            forecaster = self.demand_forecaster
+            reusable = (isinstance(forecaster, DemandForecaster) and cache_dir is None and
+                        (n_jobs is None or n_jobs == forecaster.n_jobs))
+            if not reusable:
+                self.demand_forecaster = create_demand_forecaster(backend, n_jobs=n_jobs, cache_dir=cache_dir)
+        else:
+            self.demand_forecaster = create_demand_forecaster(backend)
+        keys = [key for key in keys if key in data.columns]
+        models = self.demand_forecaster.fit_many(data, keys)
+        logger.info(f"批量需求预测模型训练完成，共{len(models)}个序列")
+        return models
         
-    def predict_price(self, features: pd.DataFrame) -> np.ndarray:
-        """预测价格"""
-        if self.price_model is None:
+    def predict_price(self, features: pd.DataFrame, key: Optional[Tuple] = None) -> np.ndarray:
+        """预测价格，指定序列键时从多序列注册表中查询模型"""
+        if key is None:
+            if self.price_model is None:
+                raise ValueError("模型未训练")
+            return self.price_model.predict(features)
+
+        key = key if isinstance(key, tuple) else (key,)
+        if key not in self.price_models:
+            raise ValueError(f"序列{key}的模型未训练")
+        if self.price_models[key] is self.pooled_price_model:
+            features = features.assign(series_id=self.series_index[key])
+        return self.price_models[key].predict(features)
+    
+    def create_online_state(self, history: Optional[pd.DataFrame] = None,
+                            keys: Tuple[str, ...] = SERIES_KEYS) -> OnlineFeatureState:
+        """创建增量特征状态，可用历史数据预热"""
+        if history is None:
+            return OnlineFeatureState(self.feature_engine.spec)
+        return OnlineFeatureState.from_history(self.feature_engine.spec, history, keys)
+
+    def predict_price_online(self, state: OnlineFeatureState, key: Optional[Tuple] = None,
+                             extras: Optional[Dict[str, float]] = None) -> float:
+        """基于增量特征状态预测序列最新一条记录的价格"""
+        if key is None and state.is_keyed:
+            raise ValueError(f"特征状态按{list(state.keys)}分组，必须指定序列键")
+        columns = self.price_feature_columns if key is None else self.batch_feature_columns
+        if not columns:
             raise ValueError("模型未训练")
-        return self.price_model.predict(features)
+        row = pd.DataFrame(state.feature_row(key, columns, extras), columns=columns)
+        return float(self.predict_price(row, key)[0])
     
-    def predict_demand(self, future_dates: pd.DataFrame) -> pd.DataFrame:
-        """预测需求"""
+    def predict_demand(self, future_dates: Optional[pd.DataFrame] = None,
+                       periods: int = 365, key: Optional[Tuple] = None) -> pd.DataFrame:
+        """预测需求
+
+        只预测 future_dates 指定的日期；未指定时预测历史末尾之后的 periods 天。
+        指定序列键时使用批量训练的多序列模型。
+        """
+        if key is not None:
+            if self.demand_forecaster is None:
+                raise ValueError("模型未训练")
+            return self.demand_forecaster.forecast(key, future_dates, periods)
         if self.demand_model is None:
             raise ValueError("模型未训练")
-        future = self.demand_model.make_future_dataframe(periods=365)
+        if isinstance(self.demand_model, FourierForecaster):
+            return self.demand_model.forecast(None, future_dates, periods)
+        future = future_frame(self.demand_model.history['ds'].max(), future_dates, periods)
         forecast = self.demand_model.predict(future)
-        return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+        return forecast[FORECAST_COLUMNS]
+    
+    def build_trend_cube(self, data: pd.DataFrame) -> TrendCube:
+        """由价格数据构建按月份和序列键预聚合的价格立方体"""
+        self.trend_cube = TrendCube.from_frame(data, dimensions=SERIES_KEYS, measures=PRICE_CUBE_MEASURES)
+        return self.trend_cube
     
-    def analyze_seasonality(self, data: pd.DataFrame) -> Dict:
-        """分析季节性模式"""
+    def analyze_seasonality(self, data: Optional[pd.DataFrame] = None) -> Dict:
+        """分析季节性模式：传入 data 时重新构建价格立方体，data 为空时读取已有的立方体"""
+        if data is not None:
+            self.build_trend_cube(data)
+        if self.trend_cube is None:
+            raise ValueError("趋势立方体未构建")
         seasonal_patterns = {
-            'yearly': data.groupby(pd.Grouper(key='date', freq='Y'))['price'].mean().to_dict(),
-            'monthly': data.groupby(pd.Grouper(key='date', freq='M'))['price'].mean().to_dict(),
-            'quarterly': data.groupby(pd.Grouper(key='date', freq='Q'))['price'].mean().to_dict()
+            'yearly': self.trend_cube.period_mean('price', 'Y').to_dict(),
+            'monthly': self.trend_cube.period_mean('price', 'M').to_dict(),
+            'quarterly': self.trend_cube.period_mean('price', 'Q').to_dict()
         }
         return seasonal_patterns
     
@@ -0,0 +1,195 @@
+import pandas as pd
+from typing import Callable, Dict, List, Tuple, Optional, Union
+import logging
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 存储格式版本，格式不兼容时递增
+REGISTRY_FORMAT_VERSION = 1
+STATE_FILE = 'state.joblib'
+META_FILE = 'meta.json'
+
+
+def data_fingerprint(*frames: pd.DataFrame) -> str:
+    """计算输入数据指纹（列名、类型和逐行哈希）"""
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(json.dumps([str(column) for column in frame.columns]).encode('utf-8'))
+        digest.update(json.dumps([str(dtype) for dtype in frame.dtypes]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """版本化的本地模型仓库
+
+    目录结构为 root/<模型名>/v0001/，每个版本保存拟合状态和元数据。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _model_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def versions(self, name: str) -> List[int]:
+        """列出模型的全部版本号"""
+        model_dir = self._model_dir(name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(
+            int(entry[1:]) for entry in os.listdir(model_dir)
+            if entry.startswith('v') and entry[1:].isdigit() and
+            os.path.exists(os.path.join(model_dir, entry, META_FILE))
+        )
+
+    def latest_version(self, name: str) -> Optional[int]:
+        """返回最新版本号，不存在时返回 None"""
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def metadata(self, name: str, version: Optional[int] = None) -> Optional[Dict]:
+        """读取版本元数据"""
+        version = self.latest_version(name) if version is None else version
+        if version is None:
+            return None
+        path = os.path.join(self._model_dir(name), f'v{version:04d}', META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, name: str, state: Dict, fingerprint: Optional[str] = None,
+             feature_columns: Optional[Dict[str, List[str]]] = None) -> int:
+        """保存一个新版本，返回版本号"""
+        import joblib
+
+        version = (self.latest_version(name) or 0) + 1
+        model_dir = self._model_dir(name)
+        os.makedirs(model_dir, exist_ok=True)
+
+        # 先写入临时目录再原子重命名，避免读到写了一半的版本
+        staging = tempfile.mkdtemp(dir=model_dir, prefix='.staging-')
+        try:
+            joblib.dump(state, os.path.join(staging, STATE_FILE))
+            meta = {
+                'name': name,
+                'version': version,
+                'format_version': REGISTRY_FORMAT_VERSION,
+                'fingerprint': fingerprint,
+                'feature_columns': feature_columns or {},
+                'attributes': sorted(state),
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            os.rename(staging, os.path.join(model_dir, f'v{version:04d}'))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        logger.info(f"模型{name}已保存为版本{version}")
+        return version
+
+    def load(self, name: str, version: Optional[int] = None) -> Dict:
+        """加载指定版本（默认最新）的拟合状态"""
+        import joblib
+
+        meta = self.metadata(name, version)
+        if meta is None:
+            raise ValueError(f"模型{name}不存在可用版本")
+        if meta['format_version'] != REGISTRY_FORMAT_VERSION:
+            raise ValueError(f"模型{name}的存储格式版本{meta['format_version']}不受支持")
+        path = os.path.join(self._model_dir(name), f"v{meta['version']:04d}", STATE_FILE)
+        return joblib.load(path)
+
+
+class PersistableModel:
+    """模型持久化混入类
+
+    子类通过 persistent_attributes 声明需要保存的拟合状态，
+    也可以只保存/加载其中一部分属性（例如只保存价格模型）。
+    延迟加载时这些属性在首次访问时才从仓库读取。
+    """
+
+    persistent_attributes: Tuple[str, ...] = ()
+
+    def __getattr__(self, name: str):
+        # 仅在属性缺失时调用：延迟加载的属性在首次访问时从仓库读取
+        pending = self.__dict__.get('_pending_loads')
+        if pending and name in pending:
+            self._load_pending(pending[name])
+            return self.__dict__[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def _load_pending(self, source: Tuple):
+        """加载一个挂起的版本，并填充它负责的全部属性"""
+        registry, name, version = source
+        pending = self.__dict__['_pending_loads']
+        attributes = [attr for attr, item in pending.items() if item == source]
+        state = registry.load(name, version)
+        for attr in attributes:
+            del pending[attr]
+            # 加载前已重新训练的属性保持不变
+            if attr in state and attr not in self.__dict__:
+                self.__dict__[attr] = state[attr]
+        logger.info(f"模型{name}已从仓库加载")
+
+    def _ensure_loaded(self):
+        """完成全部挂起的延迟加载"""
+        pending = self.__dict__.get('_pending_loads')
+        while pending:
+            self._load_pending(next(iter(pending.values())))
+
+    def save_model(self, registry: ModelRegistry, name: str, fingerprint: Optional[str] = None,
+                   attributes: Optional[Tuple[str, ...]] = None) -> int:
+        """保存当前拟合状态"""
+        self._ensure_loaded()
+        state = {attr: getattr(self, attr) for attr in (attributes or self.persistent_attributes)}
+        feature_columns = {
+            attr: list(value) for attr, value in state.items()
+            if attr.endswith('feature_columns') and value is not None
+        }
+        return registry.save(name, state, fingerprint, feature_columns)
+
+    def load_model(self, registry: ModelRegistry, name: str, version: Optional[int] = None,
+                   lazy: bool = True):
+        """从仓库加载拟合状态，lazy=True 时推迟到首次使用"""
+        meta = registry.metadata(name, version)
+        if meta is None:
+            raise ValueError(f"模型{name}不存在可用版本")
+        source = (registry, name, meta['version'])
+        pending = self.__dict__.setdefault('_pending_loads', {})
+        for attr in meta['attributes']:
+            if attr in self.persistent_attributes:
+                self.__dict__.pop(attr, None)
+                pending[attr] = source
+        if not lazy:
+            self._load_pending(source)
+        return self
+
+    def warm_start(self, registry: ModelRegistry, name: str,
+                   data: Union[pd.DataFrame, Tuple[pd.DataFrame, ...]],
+                   train: Callable, attributes: Optional[Tuple[str, ...]] = None,
+                   lazy: bool = True) -> bool:
+        """输入数据指纹未变化时直接加载已保存的模型，否则训练并保存新版本
+
+        返回 True 表示复用了已保存的模型。
+        """
+        frames = data if isinstance(data, tuple) else (data,)
+        fingerprint = data_fingerprint(*frames)
+        meta = registry.metadata(name)
+        if meta is not None and meta.get('fingerprint') == fingerprint:
+            self.load_model(registry, name, meta['version'], lazy=lazy)
+            return True
+
+        train(*frames)
+        self.save_model(registry, name, fingerprint, attributes)
+        return False
\ No newline at end of file
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Optional, Sequence
+import logging
+import math
+from datetime import date, datetime
+from .feature_engine import FeatureSpec
+
+logger = logging.getLogger(__name__)
+
+# 每隔多少次更新重新校准一次滚动累加量
+RESYNC_INTERVAL = 4096
+
+
+class _SeriesState:
+    """单个序列的环形缓冲区和滚动窗口累加量"""
+
+    __slots__ = ('buffers', 'head', 'count', 'sums', 'squares', 'missing', 'date')
+
+    def __init__(self, n_sources: int, capacity: int, n_windows: int):
+        self.buffers = [[math.nan] * capacity for _ in range(n_sources)]
+        self.head = 0
+        self.count = 0
+        self.sums = [0.0] * n_windows
+        self.squares = [0.0] * n_windows
+        self.missing = [0] * n_windows
+        self.date = None
+
+
+class OnlineFeatureState:
+    """增量特征状态
+
+    为每个序列保存最近若干条观测的环形缓冲区，新记录到达时以 O(1)
+    更新滞后、差分和滚动窗口统计，输出与 FeatureEngine 一致的特征行。
+    """
+
+    def __init__(self, spec: FeatureSpec, keys: Sequence[str] = ()):
+        self.spec = spec
+        # 序列键列名，为空表示只有一个不分组的序列
+        self.keys = tuple(keys)
+        self.sources = spec.source_columns
+        self.source_index = {column: i for i, column in enumerate(self.sources)}
+        self.capacity = spec.max_lookback + 1
+        # 滚动窗口特征在累加量数组中的位置
+        self.windows = [
+            (self.source_index[column], param)
+            for _, op, column, param in spec.features
+            if op in ('mean', 'std', 'sum')
+        ]
+        self.series: Dict[Tuple, _SeriesState] = {}
+
+    @classmethod
+    def from_history(cls, spec: FeatureSpec, data: pd.DataFrame,
+                     keys: Sequence[str] = (), date_col: str = 'date') -> 'OnlineFeatureState':
+        """用历史数据预热状态，每个序列只回放最近的必要记录"""
+        keys = [key for key in keys if key in data.columns]
+        state = cls(spec, keys)
+        history = data.assign(**{date_col: pd.to_datetime(data[date_col])})
+        history = history.sort_values([*keys, date_col], kind='mergesort')
+        if keys:
+            history = history.groupby(keys, sort=False).tail(state.capacity)
+        else:
+            history = history.tail(state.capacity)
+
+        key_values = history[keys].itertuples(index=False, name=None) if keys else [()] * len(history)
+        for key, when, values in zip(key_values, history[date_col], history[state.sources].to_numpy()):
+            state.update(key, when, **dict(zip(state.sources, values)))
+        return state
+
+    @property
+    def is_keyed(self) -> bool:
+        """状态是否按序列键分组"""
+        return bool(self.keys) or any(key != () for key in self.series)
+
+    def last_date(self, key: Optional[Tuple]):
+        """序列最新一条观测的日期，序列不存在时为 None"""
+        series = self.series.get(_normalize_key(key))
+        return None if series is None else series.date
+
+    def update(self, key: Optional[Tuple], when, **values: float):
+        """写入一条新观测并更新该序列的滚动统计"""
+        key = _normalize_key(key)
+        series = self.series.get(key)
+        if series is None:
+            series = _SeriesState(len(self.sources), self.capacity, len(self.windows))
+            self.series[key] = series
+
+        incoming = [float(values.get(column, math.nan)) for column in self.sources]
+        for i, (source, window) in enumerate(self.windows):
+            new_value = incoming[source]
+            if math.isnan(new_value):
+                series.missing[i] += 1
+            else:
+                series.sums[i] += new_value
+                series.squares[i] += new_value * new_value
+            if series.count >= window:
+                old_value = series.buffers[source][(series.head - window) % self.capacity]
+                if math.isnan(old_value):
+                    series.missing[i] -= 1
+                else:
+                    series.sums[i] -= old_value
+                    series.squares[i] -= old_value * old_value
+
+        for source, value in enumerate(incoming):
+            series.buffers[source][series.head] = value
+        series.head = (series.head + 1) % self.capacity
+        series.count += 1
+        series.date = when
+        if series.count % RESYNC_INTERVAL == 0:
+            self._resync(series)
+
+    def _resync(self, series: _SeriesState):
+        """按缓冲区重新计算累加量，消除长时间增量更新的浮点误差"""
+        for i, (source, window) in enumerate(self.windows):
+            recent = [
+                series.buffers[source][(series.head - offset) % self.capacity]
+                for offset in range(1, window + 1)
+            ]
+            observed = [value for value in recent if not math.isnan(value)]
+            series.sums[i] = sum(observed)
+            series.squares[i] = sum(value * value for value in observed)
+            series.missing[i] = len(recent) - len(observed)
+
+    def features(self, key: Optional[Tuple]) -> Dict[str, float]:
+        """返回序列最新一条观测对应的特征"""
+        key = _normalize_key(key)
+        if key not in self.series:
+            raise ValueError(f"序列{key}没有任何观测")
+        series = self.series[key]
+
+        result = _calendar_features(series.date, self.spec.calendar_parts)
+        window_index = 0
+        for name, op, column, param in self.spec.features:
+            buffer = series.buffers[self.source_index[column]]
+            latest = buffer[(series.head - 1) % self.capacity]
+            if op in ('lag', 'diff'):
+                past = buffer[(series.head - 1 - param) % self.capacity] if series.count > param else math.nan
+                result[name] = past if op == 'lag' else latest - past
+                continue
+
+            value = math.nan
+            if series.count >= param and series.missing[window_index] == 0:
+                total = series.sums[window_index]
+                if op == 'sum':
+                    value = total
+                elif op == 'mean':
+                    value = total / param
+                elif param > 1:
+                    squares = series.squares[window_index] - total * total / param
+                    value = math.sqrt(max(squares, 0.0) / (param - 1))
+            result[name] = value
+            window_index += 1
+        return result
+
+    def feature_row(self, key: Optional[Tuple], columns: Optional[List[str]] = None,
+                    extras: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """按指定列顺序输出单行 float32 特征，非特征列从 extras 中读取"""
+        values = self.features(key)
+        if extras:
+            values.update(extras)
+        columns = columns or self.spec.columns
+        return np.array([[values.get(column, math.nan) for column in columns]], dtype=np.float32)
+
+
+def _normalize_key(key) -> Tuple:
+    """统一序列键为元组"""
+    if key is None:
+        return ()
+    return key if isinstance(key, tuple) else (key,)
+
+
+def _calendar_features(when, parts: List[str]) -> Dict[str, float]:
+    """计算单个日期的日历特征"""
+    if not parts:
+        return {}
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    elif not isinstance(when, (date, datetime)):
+        when = pd.Timestamp(when).to_pydatetime()
+    values = {
+        'year': when.year,
+        'month': when.month,
+        'quarter': (when.month - 1) // 3 + 1,
+        'day': when.day,
+        'dayofweek': when.weekday(),
+        'dayofyear': when.timetuple().tm_yday
+    }
+    return {part: float(values[part]) for part in parts}
\ No newline at end of file
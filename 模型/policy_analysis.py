@@ -1,17 +1,18 @@
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestRegressor
 from typing import Dict, List, Tuple, Optional
 import logging
 from datetime import datetime
-import statsmodels.api as sm
+from .model_registry import PersistableModel
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class PolicyAnalysisModel:
+class PolicyAnalysisModel(PersistableModel):
+    persistent_attributes = ('impact_model', 'scaler')
+
     def __init__(self):
+        from sklearn.preprocessing import StandardScaler
+
         self.impact_model = None
         self.scaler = StandardScaler()
         
@@ -51,6 +52,8 @@ class PolicyAnalysisModel:
     
     def analyze_poverty_alleviation(self, data: pd.DataFrame) -> Dict:
         """分析扶贫政策效果"""
+        import statsmodels.api as sm
+
         # 准备特征
         features = data.copy()
         features['time_in_program'] = (pd.to_datetime(features['date']) - 
@@ -62,6 +65,7 @@ class PolicyAnalysisModel:
         
         model = sm.OLS(y, sm.add_constant(X))
         results = model.fit()
+        self.impact_model = results
         
         # 分析政策效果
         poverty_analysis = {
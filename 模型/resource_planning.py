@@ -1,49 +1,60 @@
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 from typing import Dict, List, Tuple, Optional
 import logging
 from datetime import datetime
-import geopandas as gpd
+from .model_registry import PersistableModel
+from .land_scoring import SuitabilityScorer, LandSource, DEFAULT_CHUNKSIZE
+from .spatial_index import SpatialIndex, nearest_distances
+from .rotation_planner import RotationPlanner, DEFAULT_BEAM_WIDTH
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ResourcePlanningModel:
+# 土地资源聚类使用的特征
+LAND_CLUSTER_FEATURES = ['latitude', 'longitude', 'suitability_score']
+# MiniBatchKMeans 的默认小批量大小
+MINIBATCH_SIZE = 4096
+# 推荐轮作序列的束宽：序列覆盖全部作物，状态很宽，只保留少量候选
+SEQUENCE_BEAM_WIDTH = 8
+
+class ResourcePlanningModel(PersistableModel):
+    persistent_attributes = ('land_model', 'crop_rotation_model', 'scaler')
+
     def __init__(self):
+        from sklearn.preprocessing import StandardScaler
+
         self.land_model = None
         self.crop_rotation_model = None
+        self.parcel_index = None
         self.scaler = StandardScaler()
         
-    def analyze_land_suitability(self, data: pd.DataFrame) -> pd.DataFrame:
-        """分析土地适宜性"""
-        features = data.copy()
-        
-        # 计算土地评分
-        features['soil_score'] = (
-            features['organic_matter'] * 0.3 +
-            features['ph_value'] * 0.2 +
-            features['nitrogen_content'] * 0.2 +
-            features['phosphorus_content'] * 0.15 +
-            features['potassium_content'] * 0.15
-        )
-        
-        # 地形适宜性
-        features['terrain_score'] = (
-            (features['slope'] <= 15).astype(int) * 0.4 +
-            (features['elevation'] <= 1000).astype(int) * 0.3 +
-            features['drainage_condition'] * 0.3
-        )
-        
-        # 综合评分
-        features['suitability_score'] = (
-            features['soil_score'] * 0.6 +
-            features['terrain_score'] * 0.4
-        )
-        
+    def analyze_land_suitability(self, data: pd.DataFrame, weights: Optional[Dict] = None) -> pd.DataFrame:
+        """分析土地适宜性
+
+        返回附加了 soil_score、terrain_score 和 suitability_score 的新 DataFrame，
+        与输入共享原有列的数据，不修改输入；weights 按分组覆盖
+        land_scoring.SUITABILITY_WEIGHTS 中的默认权重。
+        """
+        scores = SuitabilityScorer(weights, dtype=np.float64).score_arrays(data)
+        # 浅拷贝只复制列索引，新增评分列不会写回输入
+        features = data.copy(deep=False)
+        for column, values in scores.items():
+            features[column] = values
         return features
     
+    def score_land_suitability_stream(self, source: LandSource, output=None,
+                                      chunksize: int = DEFAULT_CHUNKSIZE,
+                                      weights: Optional[Dict] = None,
+                                      keep_columns: Tuple[str, ...] = ()) -> Dict:
+        """分块计算大规模地块表的适宜性评分
+
+        source 可以是 CSV/Parquet 路径、DataFrame 或列名到（内存映射）数组的映射；
+        评分以 float32 计算，可逐块写入 output（含 keep_columns 指定的原始列），
+        返回均值、直方图和高潜力地块数量等汇总。
+        """
+        scorer = SuitabilityScorer(weights)
+        return scorer.score_stream(source, output, chunksize, keep_columns)
+    
     def optimize_crop_rotation(self, data: pd.DataFrame) -> Dict:
         """优化作物轮作方案"""
         # 分析土壤养分消耗
@@ -54,28 +65,8 @@ class ResourcePlanningModel:
         })
         
         # 计算作物互补性
-        crop_compatibility = pd.DataFrame(index=data['crop_type'].unique(),
-                                        columns=data['crop_type'].unique())
-        
-        for crop1 in crop_compatibility.index:
-            for crop2 in crop_compatibility.columns:
-                if crop1 != crop2:
-                    # 计算养分互补性得分
-                    nutrient_balance = 1 - abs(
-                        nutrient_consumption.loc[crop1] -
-                        nutrient_consumption.loc[crop2]
-                    ).mean()
-                    
-                    # 考虑病虫害防治效果
-                    pest_control = data[
-                        (data['previous_crop'] == crop1) &
-                        (data['current_crop'] == crop2)
-                    ]['pest_occurrence'].mean()
-                    
-                    crop_compatibility.loc[crop1, crop2] = (
-                        nutrient_balance * 0.7 +
-                        (1 - pest_control) * 0.3
-                    )
+        crop_compatibility = self._calculate_crop_compatibility(data, nutrient_consumption)
+        self.crop_rotation_model = crop_compatibility
         
         return {
             'nutrient_consumption': nutrient_consumption.to_dict(),
@@ -83,44 +74,166 @@ class ResourcePlanningModel:
             'recommended_rotation': self._generate_rotation_sequence(crop_compatibility)
         }
     
-    def _generate_rotation_sequence(self, compatibility_matrix: pd.DataFrame) -> List[str]:
-        """生成最优轮作序列"""
-        crops = compatibility_matrix.index.tolist()
-        sequence = [crops[0]]  # 从第一个作物开始
+    def _calculate_crop_compatibility(self, data: pd.DataFrame,
+                                      nutrient_consumption: pd.DataFrame) -> pd.DataFrame:
+        """计算作物互补性矩阵（前茬为行、后茬为列），对角线及无轮作记录的组合为 NaN"""
+        crops = pd.unique(data['crop_type'])
+        
+        # 养分互补性得分：两两作物养分消耗差的绝对值均值（忽略缺失值）
+        nutrients = nutrient_consumption.reindex(crops).to_numpy(dtype=np.float64)
+        difference = np.abs(nutrients[:, None, :] - nutrients[None, :, :])
+        observed = ~np.isnan(difference)
+        counts = observed.sum(axis=2)
+        with np.errstate(invalid='ignore'):
+            nutrient_balance = 1 - np.where(observed, difference, 0.0).sum(axis=2) / counts
         
-        for _ in range(len(crops) - 1):
-            current_crop = sequence[-1]
-            next_crop = compatibility_matrix.loc[current_crop].idxmax()
-            
-            if next_crop in sequence:
-                # 如果最佳作物已在序列中，选择次优
-                next_crop = compatibility_matrix.loc[current_crop].nlargest(2).index[1]
-            
-            sequence.append(next_crop)
+        # 病虫害防治效果：一次分组得到全部前后茬组合的平均发生率
+        pest_control = data.groupby(['previous_crop', 'current_crop'])['pest_occurrence'].mean()
+        pest_control = pest_control.unstack().reindex(index=crops, columns=crops).to_numpy(dtype=np.float64)
         
-        return sequence
+        compatibility = nutrient_balance * 0.7 + (1 - pest_control) * 0.3
+        np.fill_diagonal(compatibility, np.nan)
+        return pd.DataFrame(compatibility, index=crops, columns=crops)
     
-    def analyze_resource_distribution(self, data: pd.DataFrame) -> Dict:
-        """分析资源分布情况"""
+    def _generate_rotation_sequence(self, compatibility_matrix: pd.DataFrame) -> List[str]:
+        """生成轮作序列：从第一个作物开始、每种作物各出现一次，束搜索相邻互补性之和较高的顺序"""
+        crops = compatibility_matrix.index.tolist()
+        if len(crops) <= 1:
+            return crops
+        planner = RotationPlanner(compatibility_matrix, min_gap=len(crops) - 1,
+                                  beam_width=min(SEQUENCE_BEAM_WIDTH, len(crops)))
+        sequence, _ = planner.plan(len(crops) - 1, previous_crop=crops[0], allowed=crops[1:])
+        return [crops[0]] + sequence
+    
+    def plan_field_rotations(self, fields: pd.DataFrame, horizon: int = 4, min_gap: int = 2,
+                             cyclic: bool = False, beam_width: int = DEFAULT_BEAM_WIDTH,
+                             n_jobs: int = 1) -> pd.DataFrame:
+        """为每个地块规划未来 horizon 季的轮作方案
+
+        fields 包含 field_id、previous_crop 和 allowed_crops（作物列表）列；同一作物
+        至少间隔 min_gap 季才能再次种植。需要先调用 optimize_crop_rotation。
+        """
+        if self.crop_rotation_model is None:
+            raise ValueError("模型未训练")
+        planner = RotationPlanner(self.crop_rotation_model, min_gap, beam_width)
+        return planner.plan_fields(fields, horizon, cyclic=cyclic, n_jobs=n_jobs)
+    
+    def analyze_resource_distribution(self, data: pd.DataFrame, mode: str = 'full',
+                                      n_clusters: int = 5, batch_size: int = MINIBATCH_SIZE) -> Dict:
+        """分析资源分布情况
+
+        mode='minibatch' 时以 batch_size 为小批量大小拟合 MiniBatchKMeans，适合千万级
+        地块且之后可用 update_land_clusters 继续训练；不修改输入数据。
+        """
         # 土地资源聚类
-        land_features = data[['latitude', 'longitude', 'suitability_score']]
-        kmeans = KMeans(n_clusters=5, random_state=42)
-        data['land_cluster'] = kmeans.fit_predict(self.scaler.fit_transform(land_features))
+        land_features = data[LAND_CLUSTER_FEATURES]
+        if mode == 'full':
+            from sklearn.cluster import KMeans
+
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+            labels = kmeans.fit_predict(self.scaler.fit_transform(land_features))
+        elif mode == 'minibatch':
+            from sklearn.cluster import MiniBatchKMeans
+
+            # 数据已在内存中，用 fit 使 batch_size 和 n_init 生效；partial_fit 只用于后续增量更新
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=batch_size, n_init=3)
+            labels = kmeans.fit_predict(self.scaler.fit_transform(land_features))
+        else:
+            raise ValueError(f"未知的聚类模式: {mode}，可选: full, minibatch")
+        self.land_model = kmeans
+        data = data.assign(land_cluster=labels)
         
         # 统计各区域特征
         cluster_stats = data.groupby('land_cluster').agg({
             'suitability_score': 'mean',
             'area': 'sum',
-            'water_resource': 'mean',
-            'soil_type': lambda x: x.mode()[0]
-        }).to_dict()
+            'water_resource': 'mean'
+        })
+        # 各簇的主要土壤类型：计数最多者，并列时取排序最小者（与 Series.mode 一致）
+        soil_counts = data.groupby(['land_cluster', 'soil_type'], observed=True).size().reset_index(name='count')
+        dominant_soil = soil_counts.sort_values(
+            ['land_cluster', 'count', 'soil_type'], ascending=[True, False, True]
+        ).drop_duplicates('land_cluster').set_index('land_cluster')['soil_type']
+        cluster_stats['soil_type'] = dominant_soil
         
         return {
             'cluster_centers': kmeans.cluster_centers_.tolist(),
-            'cluster_stats': cluster_stats,
+            'cluster_stats': cluster_stats.to_dict(),
             'resource_distribution': self._calculate_resource_distribution(data)
         }
     
+    def update_land_clusters(self, data: pd.DataFrame, batch_size: int = 100000):
+        """用新地块增量更新 MiniBatchKMeans 聚类，无需全量重新拟合"""
+        if not hasattr(self.land_model, 'partial_fit'):
+            raise ValueError("当前土地聚类模型不支持增量更新，请使用 mode='minibatch' 训练")
+        features = data[LAND_CLUSTER_FEATURES]
+        for start in range(0, len(features), batch_size):
+            self.land_model.partial_fit(self.scaler.transform(features.iloc[start:start + batch_size]))
+        return self
+    
+    def assign_land_clusters(self, data: pd.DataFrame, batch_size: int = 100000) -> pd.Series:
+        """把地块分配到已有的土地聚类"""
+        if self.land_model is None:
+            raise ValueError("模型未训练")
+        features = data[LAND_CLUSTER_FEATURES]
+        labels = np.empty(len(features), dtype=np.int32)
+        for start in range(0, len(features), batch_size):
+            labels[start:start + batch_size] = self.land_model.predict(
+                self.scaler.transform(features.iloc[start:start + batch_size])
+            )
+        return pd.Series(labels, index=data.index, name='land_cluster')
+    
+    def _parcel_geometries(self, data: pd.DataFrame):
+        """地块几何：GeoDataFrame 直接使用其几何列，否则由经纬度构造点"""
+        import geopandas as gpd
+
+        if isinstance(data, gpd.GeoDataFrame):
+            return data.geometry
+        return gpd.GeoSeries(gpd.points_from_xy(data['longitude'], data['latitude']),
+                             index=data.index, crs='EPSG:4326')
+    
+    def build_parcel_index(self, data: pd.DataFrame, path: Optional[str] = None) -> SpatialIndex:
+        """构建地块空间索引（米制坐标系），指定 path 时保存到磁盘"""
+        index = SpatialIndex.from_geometries(self._parcel_geometries(data))
+        if path is not None:
+            index.save(path)
+        self.parcel_index = index
+        return index
+    
+    def load_parcel_index(self, path: str, mmap: bool = True) -> SpatialIndex:
+        """以内存映射方式加载已保存的地块空间索引"""
+        self.parcel_index = SpatialIndex.load(path, mmap)
+        return self.parcel_index
+    
+    def parcels_within(self, data: pd.DataFrame, geometry, distance_km: float,
+                       crs: str = 'EPSG:4326') -> pd.DataFrame:
+        """查询距给定几何（渠道、道路、仓库等）不超过 distance_km 的地块
+
+        data 必须是构建索引时使用的地块表；先用索引筛选候选，再按精确距离过滤。
+        """
+        import geopandas as gpd
+
+        if self.parcel_index is None:
+            raise ValueError("空间索引未构建")
+        target = gpd.GeoSeries([geometry], crs=crs).to_crs(self.parcel_index.crs).iloc[0]
+        distance = distance_km * 1000
+        minx, miny, maxx, maxy = target.bounds
+        candidates = self.parcel_index.query_bbox(minx - distance, miny - distance, maxx + distance, maxy + distance)
+        geometries = self._parcel_geometries(data).iloc[candidates].to_crs(self.parcel_index.crs)
+        return data.iloc[candidates[(geometries.distance(target) <= distance).to_numpy()]]
+    
+    def compute_proximity_features(self, data: pd.DataFrame, targets: Dict,
+                                   max_distance_km: Optional[float] = None) -> pd.DataFrame:
+        """批量计算地块到各类目标的最近距离（千米）
+
+        targets 为 {特征名: GeoDataFrame/GeoSeries}，例如 {'road_distance': roads}。
+        """
+        geometries = self._parcel_geometries(data)
+        return data.assign(**{
+            name: nearest_distances(geometries, target, max_distance_km)
+            for name, target in targets.items()
+        })
+    
     def _calculate_resource_distribution(self, data: pd.DataFrame) -> Dict:
         """计算资源分布指标"""
         return {
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 默认束宽：状态数不超过束宽时束搜索等价于精确动态规划
+DEFAULT_BEAM_WIDTH = 64
+
+
+def _encode_states(state: np.ndarray, n_crops: int) -> np.ndarray:
+    """状态编码为单个整数以便快速去重，位数不足时保持二维"""
+    if state.shape[1] * np.log2(max(n_crops, 2)) < 62:
+        return state @ (n_crops ** np.arange(state.shape[1], dtype=np.int64))
+    return state
+
+
+class RotationPlanner:
+    """多季轮作规划引擎
+
+    在互补性矩阵上做按状态去重的束搜索：状态为最近 min_gap 季的作物，同一状态只保留
+    得分最高的部分序列（动态规划），再按得分保留 beam_width 个状态。min_gap=1 时状态
+    即上一季作物，束宽不小于作物数时结果为精确最优（Viterbi）。
+    前茬作物和允许作物集合相同的地块共享规划结果。
+    """
+
+    def __init__(self, compatibility: pd.DataFrame, min_gap: int = 1,
+                 beam_width: int = DEFAULT_BEAM_WIDTH, missing_score: float = 0.0):
+        self.crops = list(compatibility.index)
+        self.crop_index = {crop: i for i, crop in enumerate(self.crops)}
+        scores = compatibility.reindex(columns=self.crops).to_numpy(dtype=np.float64)
+        # 无轮作记录的组合按 missing_score 计分
+        self.scores = np.where(np.isnan(scores), missing_score, scores)
+        self.min_gap = min_gap
+        self.beam_width = beam_width
+        self._cache: Dict[Tuple, Tuple[List, float]] = {}
+
+    def _allowed_indices(self, allowed: Optional[Sequence]) -> np.ndarray:
+        if allowed is None:
+            return np.arange(len(self.crops))
+        unknown = [crop for crop in allowed if crop not in self.crop_index]
+        if unknown:
+            raise ValueError(f"未知的作物: {unknown}")
+        return np.array(sorted({self.crop_index[crop] for crop in allowed}), dtype=np.int64)
+
+    def _search(self, horizon: int, previous: Optional[int], allowed: np.ndarray,
+                cyclic: bool) -> Tuple[np.ndarray, float]:
+        """束搜索，返回作物编号序列和得分"""
+        if allowed.size == 0:
+            raise ValueError("允许的作物集合为空")
+        # 可选作物太少时放宽间隔，保证总有可行方案
+        gap = min(self.min_gap, allowed.size - 1)
+        if previous is None:
+            sequences = allowed[:, None]
+            totals = np.zeros(allowed.size)
+            offset = 0
+        else:
+            sequences = np.array([[previous]], dtype=np.int64)
+            totals = np.zeros(1)
+            offset = 1
+
+        while sequences.shape[1] - offset < horizon:
+            candidates = totals[:, None] + self.scores[sequences[:, -1]][:, allowed]
+            if gap > 0:
+                recent = sequences[:, -gap:]
+                banned = (recent[:, :, None] == allowed[None, None, :]).any(axis=1)
+                candidates[banned] = -np.inf
+
+            # 按得分降序展开，再对状态去重只保留得分最高者
+            flat = candidates.ravel()
+            order = np.argsort(-flat, kind='stable')
+            order = order[np.isfinite(flat[order])]
+            parents, choices = np.divmod(order, allowed.size)
+            extended = np.column_stack([sequences[parents], allowed[choices]])
+            state = extended[:, -gap:] if gap > 0 else extended[:, -1:]
+            if cyclic:
+                state = np.column_stack([extended[:, offset], state])
+            _, first = np.unique(_encode_states(state, len(self.crops)), axis=0, return_index=True)
+            keep = np.sort(first)[:self.beam_width]
+            sequences, totals = extended[keep], flat[order[keep]]
+
+        if cyclic and horizon > 1:
+            totals = totals + self.scores[sequences[:, -1], sequences[:, offset]]
+        best = int(np.argmax(totals))
+        return sequences[best, offset:], float(totals[best])
+
+    def plan(self, horizon: int, previous_crop=None, allowed: Optional[Sequence] = None,
+             cyclic: bool = False) -> Tuple[List, float]:
+        """规划单个地块未来 horizon 季的轮作序列，返回 (作物序列, 得分)
+
+        cyclic=True 时把末季回到首季的互补性计入得分，用于可循环的轮作周期。
+        """
+        allowed_indices = self._allowed_indices(allowed)
+        previous = None
+        if previous_crop is not None and not pd.isna(previous_crop):
+            if previous_crop not in self.crop_index:
+                raise ValueError(f"未知的前茬作物: {previous_crop}")
+            previous = self.crop_index[previous_crop]
+
+        key = (horizon, previous, tuple(allowed_indices), cyclic)
+        if key not in self._cache:
+            sequence, score = self._search(horizon, previous, allowed_indices, cyclic)
+            self._cache[key] = ([self.crops[i] for i in sequence], score)
+        sequence, score = self._cache[key]
+        return list(sequence), score
+
+    def _plan_many(self, requests: List[Tuple]) -> List[Tuple[List, float]]:
+        return [self.plan(*request) for request in requests]
+
+    def plan_fields(self, fields: pd.DataFrame, horizon: int, field_col: str = 'field_id',
+                    previous_col: str = 'previous_crop', allowed_col: str = 'allowed_crops',
+                    cyclic: bool = False, n_jobs: int = 1) -> pd.DataFrame:
+        """批量规划地块轮作
+
+        fields 每行一个地块；previous_col 和 allowed_col（作物列表）缺失时不做约束。
+        相同约束的地块只规划一次，n_jobs > 1 时不同约束在进程池中并行规划。
+        """
+        previous = fields[previous_col] if previous_col in fields.columns else pd.Series(None, index=fields.index)
+        allowed = fields[allowed_col] if allowed_col in fields.columns else pd.Series(None, index=fields.index)
+        requests = [
+            (horizon, None if pd.isna(p) else p,
+             None if a is None or (np.isscalar(a) and pd.isna(a)) else tuple(sorted(set(a))), cyclic)
+            for p, a in zip(previous.tolist(), allowed.tolist())
+        ]
+        unique_requests = list(dict.fromkeys(requests))
+
+        if n_jobs > 1 and len(unique_requests) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            batches = [unique_requests[i::n_jobs] for i in range(n_jobs)]
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                planned = list(executor.map(self._plan_many, batches))
+            results = {
+                request: result
+                for batch, batch_results in zip(batches, planned)
+                for request, result in zip(batch, batch_results)
+            }
+        else:
+            results = {request: self.plan(*request) for request in unique_requests}
+        logger.info(f"完成{len(fields)}个地块的轮作规划（{len(unique_requests)}组不同约束）")
+
+        field_ids = fields[field_col] if field_col in fields.columns else fields.index.to_series()
+        return pd.DataFrame({
+            field_col: field_ids.to_numpy(),
+            'rotation': [results[request][0] for request in requests],
+            'score': [results[request][1] for request in requests]
+        })
\ No newline at end of file
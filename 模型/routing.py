@@ -0,0 +1,334 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Tuple, Optional
+from collections import OrderedDict
+from collections.abc import Mapping
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 路由指标 -> 物流数据中的边权列
+ROUTE_METRICS = {
+    'cost': 'transport_cost',
+    'time': 'transport_time'
+}
+# 路线表每次计算的起点数，以及缓存的起点块数
+ROUTE_BLOCK_SIZE = 64
+ROUTE_CACHE_BLOCKS = 4
+
+
+class RoutingEngine:
+    """基于稀疏矩阵的物流网络最短路引擎
+
+    由边表批量构建无向图的 CSR 邻接矩阵，每个起点只做一次单源 Dijkstra，
+    保存前驱数组以便按需还原路径，而不是为每一对节点保存路径列表。
+    """
+
+    def __init__(self, nodes: np.ndarray, edges: pd.DataFrame):
+        self.nodes = nodes
+        self.node_index = {node: i for i, node in enumerate(nodes)}
+        self.edges = edges
+        self.edge_index = {
+            (u, v): row for row, (u, v) in enumerate(zip(edges['u'].to_numpy(), edges['v'].to_numpy()))
+        }
+        self.matrices = {
+            metric: self._adjacency(edges[column].to_numpy(dtype=np.float64))
+            for metric, column in ROUTE_METRICS.items()
+        }
+
+    @classmethod
+    def from_edges(cls, data: pd.DataFrame) -> 'RoutingEngine':
+        """由物流边表构建引擎，同一对节点的重复边以最后一条为准，自环被忽略"""
+        codes, nodes = pd.factorize(pd.concat([data['origin'], data['destination']], ignore_index=True))
+        n_edges = len(data)
+        source, target = codes[:n_edges], codes[n_edges:]
+
+        edges = pd.DataFrame({
+            'u': np.minimum(source, target),
+            'v': np.maximum(source, target),
+            'transport_cost': data['transport_cost'].to_numpy(dtype=np.float64),
+            'transport_time': data['transport_time'].to_numpy(dtype=np.float64),
+            'transport_capacity': data['transport_capacity'].to_numpy(dtype=np.float64)
+        })
+        edges = edges[edges['u'] != edges['v']].drop_duplicates(['u', 'v'], keep='last')
+        return cls(np.asarray(nodes), edges.reset_index(drop=True))
+
+    def _adjacency(self, weights: np.ndarray):
+        """构建对称 CSR 邻接矩阵"""
+        from scipy.sparse import csr_matrix
+
+        u = self.edges['u'].to_numpy()
+        v = self.edges['v'].to_numpy()
+        n = len(self.nodes)
+        return csr_matrix(
+            (np.concatenate([weights, weights]), (np.concatenate([u, v]), np.concatenate([v, u]))),
+            shape=(n, n)
+        )
+
+    def node_id(self, node) -> int:
+        """节点名称转换为编号"""
+        if node not in self.node_index:
+            raise ValueError(f"网络中不存在节点{node}")
+        return self.node_index[node]
+
+    def add_edge(self, u: int, v: int, cost: float, time: float, capacity: float = 0.0):
+        """新增一条边，费用和时间都必须给出"""
+        u, v = min(u, v), max(u, v)
+        if (u, v) in self.edge_index:
+            raise ValueError(f"边({self.nodes[u]}, {self.nodes[v]})已存在")
+        new_edge = {'u': u, 'v': v, ROUTE_METRICS['cost']: float(cost), ROUTE_METRICS['time']: float(time),
+                    'transport_capacity': float(capacity)}
+        self.edges = pd.concat([self.edges, pd.DataFrame([new_edge])], ignore_index=True)
+        self.edge_index[(u, v)] = len(self.edges) - 1
+        self.matrices = {
+            name: self._adjacency(self.edges[edge_column].to_numpy(dtype=np.float64))
+            for name, edge_column in ROUTE_METRICS.items()
+        }
+
+    def set_edge_weight(self, u: int, v: int, metric: str, weight: float) -> float:
+        """修改一条已有边的权重，返回修改前的权重"""
+        u, v = min(u, v), max(u, v)
+        column = ROUTE_METRICS[metric]
+        row = self.edge_index.get((u, v))
+        if row is None:
+            raise ValueError(f"网络中不存在边({self.nodes[u]}, {self.nodes[v]})，新增边请使用 add_edge")
+
+        old_weight = float(self.edges.at[row, column])
+        self.edges.at[row, column] = weight
+        matrix = self.matrices[metric]
+        for a, b in ((u, v), (v, u)):
+            start, end = matrix.indptr[a], matrix.indptr[a + 1]
+            matrix.data[start + np.flatnonzero(matrix.indices[start:end] == b)] = weight
+        return old_weight
+
+    def shortest_paths(self, metric: str = 'cost', origins: Optional[np.ndarray] = None,
+                       return_predecessors: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """计算指定起点（默认全部）的距离矩阵和前驱矩阵，不需要前驱时第二项为 None"""
+        from scipy.sparse.csgraph import dijkstra
+
+        if metric not in self.matrices:
+            raise ValueError(f"未知的路由指标: {metric}，可选: {list(ROUTE_METRICS)}")
+        indices = np.arange(len(self.nodes)) if origins is None else np.asarray(origins)
+        if not return_predecessors:
+            return dijkstra(self.matrices[metric], directed=True, indices=indices), None
+        distances, predecessors = dijkstra(
+            self.matrices[metric], directed=True, indices=indices, return_predecessors=True
+        )
+        return distances, predecessors.astype(np.int32)
+
+    def reconstruct_path(self, predecessors: np.ndarray, origin: int, destination: int) -> List:
+        """由单源前驱数组还原路径上的节点名称"""
+        path = [destination]
+        while path[-1] != origin:
+            previous = predecessors[path[-1]]
+            if previous < 0:
+                return []
+            path.append(previous)
+        # tolist() 把 NumPy 标量转换为 Python 对象，路径可直接 JSON 序列化
+        return self.nodes[path[::-1]].tolist()
+
+    def route_table(self, block_size: int = ROUTE_BLOCK_SIZE) -> 'RouteTable':
+        """返回全部节点对的路线表，按起点分块在访问时计算"""
+        return RouteTable(self, block_size)
+
+    def adjacency(self):
+        """无权邻接矩阵，由边的存在与否决定（零权重的边同样计入）"""
+        adjacency = self.matrices['cost'].copy()
+        adjacency.data[:] = 1.0
+        return adjacency
+
+    def network_stats(self) -> Dict:
+        """计算网络统计指标"""
+        from scipy.sparse.csgraph import connected_components
+
+        n_nodes = len(self.nodes)
+        n_edges = len(self.edges)
+        adjacency = self.adjacency()
+        degree = np.asarray(adjacency.sum(axis=1)).ravel()
+        # 每个节点参与的三角形数
+        triangles = np.asarray((adjacency @ adjacency).multiply(adjacency).sum(axis=1)).ravel() / 2
+        pairs = degree * (degree - 1)
+        clustering = np.divide(2 * triangles, pairs, out=np.zeros(n_nodes), where=pairs > 0)
+
+        return {
+            'total_nodes': n_nodes,
+            'total_edges': n_edges,
+            'average_degree': 2 * n_edges / n_nodes if n_nodes else 0.0,
+            'density': 2 * n_edges / (n_nodes * (n_nodes - 1)) if n_nodes > 1 else 0.0,
+            'average_clustering': float(clustering.mean()) if n_nodes else 0.0,
+            'connected_components': int(connected_components(adjacency, directed=False)[0])
+        }
+
+
+class RouteService:
+    """按需查询的路线服务
+
+    只在查询时为起点计算单源最短路树，并以 LRU 策略缓存最近使用的树；
+    边权变化时只淘汰受影响的树，而不是重新计算整个网络。
+    """
+
+    def __init__(self, engine: RoutingEngine, max_trees: int = 256):
+        self.engine = engine
+        self.max_trees = max_trees
+        self._trees = OrderedDict()
+
+    @classmethod
+    def from_logistics(cls, data: pd.DataFrame, max_trees: int = 256) -> 'RouteService':
+        """由物流边表构建路线服务"""
+        return cls(RoutingEngine.from_edges(data), max_trees)
+
+    def _tree(self, metric: str, origin: int) -> Tuple[np.ndarray, np.ndarray]:
+        """取得（必要时计算）起点的最短路树"""
+        key = (metric, origin)
+        if key in self._trees:
+            self._trees.move_to_end(key)
+            return self._trees[key]
+        distances, predecessors = self.engine.shortest_paths(metric, np.array([origin]))
+        self._trees[key] = (distances[0], predecessors[0])
+        if len(self._trees) > self.max_trees:
+            self._trees.popitem(last=False)
+        return self._trees[key]
+
+    def route(self, origin, destination, metric: str = 'cost') -> Optional[Dict]:
+        """查询按 metric 最优的路线，不可达时返回 None
+
+        total_cost 和 total_time 均为沿返回路径累计的值。
+        """
+        if metric not in ROUTE_METRICS:
+            raise ValueError(f"未知的路由指标: {metric}，可选: {list(ROUTE_METRICS)}")
+        i, j = self.engine.node_id(origin), self.engine.node_id(destination)
+        distances, predecessors = self._tree(metric, i)
+        if not np.isfinite(distances[j]):
+            return None
+
+        path = self.engine.reconstruct_path(predecessors, i, j)
+        ids = [self.engine.node_index[node] for node in path]
+        edges = self.engine.edges
+        rows = [self.engine.edge_index[(min(a, b), max(a, b))] for a, b in zip(ids, ids[1:])]
+        return {
+            'path': path,
+            'total_cost': float(edges[ROUTE_METRICS['cost']].to_numpy()[rows].sum()),
+            'total_time': float(edges[ROUTE_METRICS['time']].to_numpy()[rows].sum())
+        }
+
+    def update_edge(self, origin, destination, cost: Optional[float] = None,
+                    time: Optional[float] = None) -> int:
+        """更新已有边的费用/时间并淘汰受影响的缓存树，返回被淘汰的树数量
+
+        权重上升时只有包含该边的树受影响；权重下降时只有经该边能缩短距离的树受影响。
+        边不存在时抛出 ValueError，新增边请使用 add_edge。
+        """
+        u, v = self.engine.node_id(origin), self.engine.node_id(destination)
+        if (min(u, v), max(u, v)) not in self.engine.edge_index:
+            raise ValueError(f"网络中不存在边({origin}, {destination})，新增边请使用 add_edge")
+        evicted = 0
+        for metric, weight in (('cost', cost), ('time', time)):
+            if weight is None:
+                continue
+            old_weight = self.engine.set_edge_weight(u, v, metric, weight)
+            if weight != old_weight:
+                evicted += self._evict(metric, u, v, old_weight, weight)
+        return evicted
+
+    def add_edge(self, origin, destination, cost: float, time: float, capacity: float = 0.0) -> int:
+        """新增一条边（费用和时间都必须给出）并淘汰受影响的缓存树，返回被淘汰的树数量"""
+        u, v = self.engine.node_id(origin), self.engine.node_id(destination)
+        self.engine.add_edge(u, v, cost, time, capacity)
+        return sum(self._evict(metric, u, v, np.inf, weight)
+                   for metric, weight in (('cost', cost), ('time', time)))
+
+    def _evict(self, metric: str, u: int, v: int, old_weight: float, weight: float) -> int:
+        """淘汰边权重变化后失效的缓存树"""
+        evicted = 0
+        for key in [key for key in self._trees if key[0] == metric]:
+            distances, predecessors = self._trees[key]
+            if weight > old_weight:
+                affected = predecessors[v] == u or predecessors[u] == v
+            else:
+                affected = (distances[u] + weight < distances[v] or
+                            distances[v] + weight < distances[u])
+            if affected:
+                del self._trees[key]
+                evicted += 1
+        return evicted
+
+
+class RouteTable(Mapping):
+    """全节点对路线表
+
+    以 "起点-终点" 为键，行为与只读字典一致。不保存 N×N 矩阵：访问时按起点块
+    计算费用最短路树（含前驱）和时间距离（不含前驱），只缓存最近的
+    ROUTE_CACHE_BLOCKS 个块。不可达的节点对不在表中。
+    """
+
+    def __init__(self, engine: RoutingEngine, block_size: int = ROUTE_BLOCK_SIZE):
+        from scipy.sparse.csgraph import connected_components
+
+        self.engine = engine
+        self.block_size = block_size
+        self._blocks = OrderedDict()
+        self._key_index = {str(node): i for i, node in enumerate(engine.nodes)}
+        # 费用有限的边构成的连通分量，用于判断可达性和统计表长
+        finite = engine.matrices['cost'].copy()
+        finite.data = np.isfinite(finite.data).astype(np.float64)
+        finite.eliminate_zeros()
+        _, self._component = connected_components(finite, directed=False)
+
+    def _split_key(self, key: str) -> Tuple[int, int]:
+        """把 "起点-终点" 拆分为节点编号（节点名称本身可能包含连字符）"""
+        node_index = self._key_index
+        if isinstance(key, str):
+            position = key.find('-')
+            while position != -1:
+                origin, destination = key[:position], key[position + 1:]
+                if origin in node_index and destination in node_index:
+                    return node_index[origin], node_index[destination]
+                position = key.find('-', position + 1)
+        raise KeyError(key)
+
+    def _block(self, block: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """取得（必要时计算）一个起点块的费用距离、前驱和时间距离"""
+        if block in self._blocks:
+            self._blocks.move_to_end(block)
+            return self._blocks[block]
+        origins = np.arange(block * self.block_size, min((block + 1) * self.block_size, len(self.engine.nodes)))
+        cost, predecessors = self.engine.shortest_paths('cost', origins)
+        time, _ = self.engine.shortest_paths('time', origins, return_predecessors=False)
+        self._blocks[block] = (cost, predecessors, time)
+        if len(self._blocks) > ROUTE_CACHE_BLOCKS:
+            self._blocks.popitem(last=False)
+        return self._blocks[block]
+
+    def _reachable(self, i: int, j: int) -> bool:
+        return i != j and self._component[i] == self._component[j]
+
+    def route(self, origin, destination) -> Dict:
+        """按节点名称查询路线"""
+        return self[f'{origin}-{destination}']
+
+    def __getitem__(self, key: str) -> Dict:
+        i, j = self._split_key(key)
+        if not self._reachable(i, j):
+            raise KeyError(key)
+        cost, predecessors, time = self._block(i // self.block_size)
+        row = i % self.block_size
+        return {
+            'path': self.engine.reconstruct_path(predecessors[row], i, j),
+            'total_cost': float(cost[row, j]),
+            'total_time': float(time[row, j])
+        }
+
+    def __iter__(self) -> Iterator[str]:
+        nodes = self.engine.nodes
+        for i in range(len(nodes)):
+            for j in np.flatnonzero(self._component == self._component[i]):
+                if j != i:
+                    yield f'{nodes[i]}-{nodes[j]}'
+
+    def __len__(self) -> int:
+        sizes = np.bincount(self._component)
+        return int((sizes * (sizes - 1)).sum())
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """展开为普通字典（逐块计算，适合小规模网络或需要 JSON 序列化的场景）"""
+        return {key: self[key] for key in self}
\ No newline at end of file
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 中文评论情感词典
+POSITIVE_WORDS = (
+    '好', '不错', '满意', '喜欢', '推荐', '新鲜', '好吃', '美味', '实惠', '划算', '便宜', '快',
+    '及时', '精美', '干净', '放心', '优质', '值得', '超值', '赞', '棒', '完美', '舒服', '香',
+    '甜', '热情', '耐心', '周到', '贴心', '惊喜', '正品', '给力', '靠谱', '好评', '物美价廉'
+)
+NEGATIVE_WORDS = (
+    '差', '坏', '烂', '失望', '后悔', '难吃', '不新鲜', '贵', '慢', '破损', '变质', '发霉',
+    '腐烂', '假货', '垃圾', '糟糕', '一般', '投诉', '退货', '坑', '缺斤少两', '异味', '过期',
+    '敷衍', '恶劣', '粗糙', '麻烦', '差评', '上当', '不值'
+)
+NEGATION_WORDS = ('不', '没', '没有', '不是', '别', '无', '未', '并非', '不太', '不够')
+# 程度副词：分词器常把它们和情感词合成一个词（如“很差”“太贵”），查词典前剥去
+DEGREE_WORDS = (
+    '很', '太', '挺', '真', '超', '最', '更', '非常', '特别', '比较', '十分', '相当', '有点', '有些', '极其'
+)
+# 否定词对其后若干个词生效
+NEGATION_WINDOW = 2
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class LexiconSentimentScorer:
+    """基于 jieba 分词和情感词典的中文情感评分
+
+    得分为 (正面词数 - 负面词数) / 情感词总数，位于 [-1, 1]；否定词会翻转其后
+    NEGATION_WINDOW 个词内情感词的极性。不在词典中的词会剥去开头的否定词和程度副词
+    后再查词典（“不好”“很差”“太贵”），剥去的否定词同样翻转极性。
+    """
+
+    name = 'lexicon'
+
+    def __init__(self, positive: Sequence[str] = POSITIVE_WORDS, negative: Sequence[str] = NEGATIVE_WORDS,
+                 negations: Sequence[str] = NEGATION_WORDS, degrees: Sequence[str] = DEGREE_WORDS):
+        self.polarity = {word: 1.0 for word in positive}
+        self.polarity.update({word: -1.0 for word in negative})
+        self.negations = frozenset(negations)
+        # 可剥去的前缀，长的优先匹配
+        self.prefixes = sorted(set(negations) | set(degrees), key=len, reverse=True)
+        self._compounds: Dict[str, Optional[float]] = {}
+        self._tokenizer = None
+
+    def __getstate__(self):
+        # 分词器不随评分器传给子进程，子进程按需重新构建
+        state = self.__dict__.copy()
+        state['_tokenizer'] = None
+        return state
+
+    @property
+    def tokenizer(self):
+        """私有的 jieba 分词器，词典中的词加入其词表以免被切分开，不影响全局 jieba"""
+        if self._tokenizer is None:
+            import jieba
+
+            tokenizer = jieba.Tokenizer()
+            for word in list(self.polarity) + list(self.negations):
+                tokenizer.add_word(word)
+            self._tokenizer = tokenizer
+        return self._tokenizer
+
+    def _compound_polarity(self, token: str) -> Optional[float]:
+        """剥去未登录词开头的否定词和程度副词后查词典，查不到时返回 None"""
+        if token in self._compounds:
+            return self._compounds[token]
+        value = None
+        flipped = False
+        rest = token
+        while value is None:
+            prefix = next(
+                (prefix for prefix in self.prefixes if rest.startswith(prefix) and len(rest) > len(prefix)), None
+            )
+            if prefix is None:
+                break
+            flipped ^= prefix in self.negations
+            rest = rest[len(prefix):]
+            value = self.polarity.get(rest)
+        if value is not None and flipped:
+            value = -value
+        self._compounds[token] = value
+        return value
+
+    def score_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """批量评分"""
+        tokenizer = self.tokenizer
+        scores = np.zeros(len(texts))
+        polarity, negations = self.polarity, self.negations
+        compound_polarity = self._compound_polarity
+        for i, text in enumerate(texts):
+            total = 0.0
+            hits = 0
+            negated = 0
+            for token in tokenizer.lcut(text):
+                if token in negations:
+                    negated = NEGATION_WINDOW
+                    continue
+                value = polarity.get(token)
+                if value is None:
+                    value = compound_polarity(token)
+                if value is not None:
+                    total += -value if negated else value
+                    hits += 1
+                    negated = 0
+                elif negated:
+                    negated -= 1
+            scores[i] = total / hits if hits else 0.0
+        return scores
+
+
+class TextBlobSentimentScorer:
+    """TextBlob 情感极性评分"""
+
+    name = 'textblob'
+
+    def score_batch(self, texts: Sequence[str]) -> np.ndarray:
+        from textblob import TextBlob
+
+        return np.array([TextBlob(text).sentiment.polarity for text in texts], dtype=np.float64)
+
+
+SENTIMENT_SCORERS = {
+    'lexicon': LexiconSentimentScorer,
+    'textblob': TextBlobSentimentScorer
+}
+
+
+def create_sentiment_scorer(scorer: Union[str, object] = 'lexicon'):
+    """按名称创建评分器，也可以直接传入实现了 score_batch 的对象"""
+    if isinstance(scorer, str):
+        if scorer not in SENTIMENT_SCORERS:
+            raise ValueError(f"未知的情感评分器: {scorer}，可选: {list(SENTIMENT_SCORERS)}")
+        return SENTIMENT_SCORERS[scorer]()
+    if not hasattr(scorer, 'score_batch'):
+        raise ValueError("情感评分器必须实现score_batch方法")
+    return scorer
+
+
+class SentimentPipeline:
+    """分块并行的情感评分流水线
+
+    评论按文本哈希去重并缓存得分，重复运行时只为新文本评分；未命中缓存的文本
+    按 chunk_size 分块，n_jobs > 1 时在进程池中评分。缓存可保存为 .npz 文件。
+    """
+
+    def __init__(self, scorer: Union[str, object] = 'lexicon', n_jobs: int = 1,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, cache_path: Optional[str] = None):
+        self.scorer = create_sentiment_scorer(scorer)
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        self.cache_path = cache_path
+        self.cache = pd.Series(dtype=np.float64)
+        if cache_path is not None and os.path.exists(cache_path):
+            self.load_cache(cache_path)
+
+    @property
+    def scorer_name(self) -> str:
+        return getattr(self.scorer, 'name', type(self.scorer).__name__)
+
+    def load_cache(self, path: str):
+        """加载缓存，评分器不一致时忽略"""
+        with np.load(path, allow_pickle=False) as cached:
+            if str(cached['scorer']) != self.scorer_name:
+                logger.warning(f"情感缓存{path}由评分器{cached['scorer']}生成，已忽略")
+                return
+            self.cache = pd.Series(cached['scores'], index=cached['hashes'])
+
+    def save_cache(self, path: Optional[str] = None):
+        """保存缓存"""
+        path = path or self.cache_path
+        if path is None:
+            raise ValueError("未指定缓存路径")
+        np.savez(path, hashes=self.cache.index.to_numpy(dtype=np.uint64),
+                 scores=self.cache.to_numpy(dtype=np.float64), scorer=np.array(self.scorer_name))
+
+    def _score_texts(self, texts: List[str]) -> np.ndarray:
+        chunks = [texts[start:start + self.chunk_size] for start in range(0, len(texts), self.chunk_size)]
+        if self.n_jobs > 1 and len(chunks) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                results = list(executor.map(self.scorer.score_batch, chunks))
+        else:
+            results = [self.scorer.score_batch(chunk) for chunk in chunks]
+        return np.concatenate(results) if results else np.empty(0)
+
+    def score(self, texts: pd.Series) -> pd.Series:
+        """为评论评分，缺失文本得分为 0，索引与输入一致"""
+        present = texts.notna()
+        values = texts[present].astype(str)
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        unique_hashes, first = np.unique(hashes, return_index=True)
+
+        missing = ~pd.Index(unique_hashes).isin(self.cache.index)
+        if missing.any():
+            new_texts = values.iloc[first[missing]].tolist()
+            new_scores = self._score_texts(new_texts)
+            self.cache = pd.concat([self.cache, pd.Series(new_scores, index=unique_hashes[missing])])
+            logger.info(f"新评分{len(new_texts)}条评论，缓存命中{int((~missing).sum())}条")
+            if self.cache_path is not None:
+                self.save_cache()
+
+        scores = pd.Series(0.0, index=texts.index, name='sentiment_score')
+        scores[present.to_numpy()] = self.cache.reindex(hashes).to_numpy()
+        return scores
\ No newline at end of file
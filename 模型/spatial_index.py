@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple, Optional, Sequence
+import heapq
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 磁盘格式版本，格式不兼容时递增
+INDEX_FORMAT_VERSION = 1
+INDEX_ARRAYS = ('item_boxes', 'item_ids', 'node_boxes', 'child_start', 'child_count')
+META_FILE = 'meta.json'
+# 每个节点的最大子节点数
+DEFAULT_NODE_CAPACITY = 16
+
+
+def _str_order(boxes: np.ndarray, capacity: int) -> np.ndarray:
+    """Sort-Tile-Recursive 排列：先按 x 中心切片，片内再按 y 中心排序"""
+    n = len(boxes)
+    centre_x = (boxes[:, 0] + boxes[:, 2]) / 2
+    centre_y = (boxes[:, 1] + boxes[:, 3]) / 2
+    n_slices = int(np.ceil(np.sqrt(np.ceil(n / capacity))))
+    slice_size = n_slices * capacity
+    by_x = np.argsort(centre_x, kind='stable')
+    return np.concatenate([
+        chunk[np.argsort(centre_y[chunk], kind='stable')]
+        for chunk in (by_x[start:start + slice_size] for start in range(0, n, slice_size))
+    ])
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """把若干 [start, start + count) 区间展开为下标数组"""
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts)
+    return offsets + np.arange(total)
+
+
+def _box_distance(boxes: np.ndarray, x: float, y: float) -> np.ndarray:
+    """点到各矩形的平面距离（点在矩形内时为 0）"""
+    dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 2]), 0.0)
+    dy = np.maximum(np.maximum(boxes[:, 1] - y, y - boxes[:, 3]), 0.0)
+    return np.hypot(dx, dy)
+
+
+class SpatialIndex:
+    """以 NumPy 数组存储的 STR 打包 R 树
+
+    叶子保存对象的外包矩形和其在源表中的位置，节点按层自底向上连续存放，
+    每个节点的子节点在下一层中连续。全部数组可保存为 .npy 并以内存映射方式加载。
+    坐标单位与构建时的坐标系一致；距离按对象外包矩形计算，对点对象是精确距离。
+    """
+
+    def __init__(self, item_boxes: np.ndarray, item_ids: np.ndarray, node_boxes: np.ndarray,
+                 child_start: np.ndarray, child_count: np.ndarray, n_leaf_nodes: int,
+                 crs: Optional[str] = None):
+        self.item_boxes = item_boxes
+        self.item_ids = item_ids
+        self.node_boxes = node_boxes
+        self.child_start = child_start
+        self.child_count = child_count
+        self.n_leaf_nodes = n_leaf_nodes
+        self.crs = crs
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    @classmethod
+    def from_bounds(cls, bounds: np.ndarray, capacity: int = DEFAULT_NODE_CAPACITY,
+                    crs: Optional[str] = None) -> 'SpatialIndex':
+        """由 (minx, miny, maxx, maxy) 外包矩形数组构建索引，对象编号为行位置"""
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        if capacity < 2:
+            raise ValueError("节点容量至少为2")
+        order = _str_order(bounds, capacity) if len(bounds) else np.empty(0, dtype=np.int64)
+        item_boxes = bounds[order]
+
+        level_boxes, level_start, level_count = [], [], []
+        boxes = item_boxes
+        offset = 0
+        is_leaf_level = True
+        while is_leaf_level or len(boxes) > 1:
+            starts = np.arange(0, len(boxes), capacity)
+            counts = np.minimum(capacity, len(boxes) - starts)
+            parents = np.column_stack([
+                np.minimum.reduceat(boxes[:, 0], starts), np.minimum.reduceat(boxes[:, 1], starts),
+                np.maximum.reduceat(boxes[:, 2], starts), np.maximum.reduceat(boxes[:, 3], starts)
+            ]) if len(boxes) else np.empty((0, 4))
+            # 子节点的全局编号：叶节点指向对象，上层节点指向下一层节点
+            starts = starts + (0 if is_leaf_level else offset)
+            if not is_leaf_level:
+                offset += len(boxes)
+            if len(parents) > 1:
+                parent_order = _str_order(parents, capacity)
+                parents, starts, counts = parents[parent_order], starts[parent_order], counts[parent_order]
+            level_boxes.append(parents)
+            level_start.append(starts)
+            level_count.append(counts)
+            boxes = parents
+            is_leaf_level = False
+
+        return cls(
+            item_boxes, order.astype(np.int64), np.concatenate(level_boxes),
+            np.concatenate(level_start).astype(np.int64), np.concatenate(level_count).astype(np.int64),
+            len(level_boxes[0]), crs
+        )
+
+    @classmethod
+    def from_geometries(cls, geometries, capacity: int = DEFAULT_NODE_CAPACITY) -> 'SpatialIndex':
+        """由 GeoSeries/GeoDataFrame 构建索引，地理坐标系会先投影到对应的 UTM 米制坐标系"""
+        if geometries.crs is not None and geometries.crs.is_geographic:
+            geometries = geometries.to_crs(geometries.estimate_utm_crs())
+        crs = geometries.crs.to_string() if geometries.crs is not None else None
+        return cls.from_bounds(geometries.bounds.to_numpy(), capacity, crs)
+
+    @property
+    def _root(self) -> Optional[int]:
+        return len(self.node_boxes) - 1 if len(self.item_ids) else None
+
+    def _project(self, x: float, y: float, crs: Optional[str]) -> Tuple[float, float]:
+        """把查询点从 crs 转换到索引坐标系"""
+        if crs is None or self.crs is None:
+            return x, y
+        from pyproj import Transformer
+
+        transformer = Transformer.from_crs(crs, self.crs, always_xy=True)
+        return transformer.transform(x, y)
+
+    def _query_slots(self, minx: float, miny: float, maxx: float, maxy: float) -> np.ndarray:
+        """返回外包矩形与查询矩形相交的叶子槽位"""
+        root = self._root
+        if root is None:
+            return np.empty(0, dtype=np.int64)
+        frontier = np.array([root])
+        items = []
+        while frontier.size:
+            boxes = self.node_boxes[frontier]
+            frontier = frontier[
+                (boxes[:, 0] <= maxx) & (boxes[:, 2] >= minx) & (boxes[:, 1] <= maxy) & (boxes[:, 3] >= miny)
+            ]
+            leaf = frontier < self.n_leaf_nodes
+            items.append(_expand_ranges(self.child_start[frontier[leaf]], self.child_count[frontier[leaf]]))
+            frontier = _expand_ranges(self.child_start[frontier[~leaf]], self.child_count[frontier[~leaf]])
+
+        candidates = np.concatenate(items)
+        boxes = self.item_boxes[candidates]
+        hit = (boxes[:, 0] <= maxx) & (boxes[:, 2] >= minx) & (boxes[:, 1] <= maxy) & (boxes[:, 3] >= miny)
+        return candidates[hit]
+
+    def query_bbox(self, minx: float, miny: float, maxx: float, maxy: float) -> np.ndarray:
+        """返回外包矩形与查询矩形相交的对象编号"""
+        return np.sort(np.asarray(self.item_ids[self._query_slots(minx, miny, maxx, maxy)]))
+
+    def query_radius(self, x: float, y: float, radius: float, crs: Optional[str] = None) -> np.ndarray:
+        """返回距查询点不超过 radius（索引坐标系单位）的对象编号"""
+        x, y = self._project(x, y, crs)
+        slots = self._query_slots(x - radius, y - radius, x + radius, y + radius)
+        distance = _box_distance(self.item_boxes[slots], x, y)
+        return np.sort(np.asarray(self.item_ids[slots[distance <= radius]]))
+
+    def nearest(self, x: float, y: float, k: int = 1, crs: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """返回最近的 k 个对象编号及距离（最优优先搜索）"""
+        x, y = self._project(x, y, crs)
+        root = self._root
+        if root is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        # 堆元素：(距离, 是否为对象, 编号)；节点距离是其子树中对象距离的下界
+        heap = [(0.0, False, root)]
+        ids, distances = [], []
+        while heap and len(ids) < k:
+            distance, is_item, index = heapq.heappop(heap)
+            if is_item:
+                ids.append(int(self.item_ids[index]))
+                distances.append(distance)
+                continue
+            children = np.arange(self.child_start[index], self.child_start[index] + self.child_count[index])
+            child_is_item = index < self.n_leaf_nodes
+            boxes = self.item_boxes[children] if child_is_item else self.node_boxes[children]
+            for child, child_distance in zip(children.tolist(), _box_distance(boxes, x, y).tolist()):
+                heapq.heappush(heap, (child_distance, child_is_item, child))
+        return np.array(ids, dtype=np.int64), np.array(distances)
+
+    def save(self, path: str):
+        """保存为目录下的 .npy 数组和元数据"""
+        os.makedirs(path, exist_ok=True)
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'format_version': INDEX_FORMAT_VERSION,
+                'n_leaf_nodes': self.n_leaf_nodes,
+                'crs': self.crs
+            }, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'SpatialIndex':
+        """加载索引，mmap=True 时数组以只读内存映射方式打开"""
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['format_version'] != INDEX_FORMAT_VERSION:
+            raise ValueError(f"空间索引格式版本{meta['format_version']}不受支持")
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None)
+            for name in INDEX_ARRAYS
+        }
+        return cls(n_leaf_nodes=meta['n_leaf_nodes'], crs=meta['crs'], **arrays)
+
+
+def nearest_distances(sources, targets, max_distance: Optional[float] = None) -> pd.Series:
+    """批量计算每个源对象到最近目标对象的距离（千米）
+
+    sources 和 targets 为 GeoDataFrame/GeoSeries，在源数据对应的 UTM 米制坐标系中
+    通过 geopandas.sjoin_nearest 计算；超过 max_distance（千米）的记为 NaN。
+    """
+    import geopandas as gpd
+
+    sources = gpd.GeoDataFrame(geometry=gpd.GeoSeries(sources.geometry if hasattr(sources, 'geometry') else sources))
+    targets = gpd.GeoDataFrame(geometry=gpd.GeoSeries(targets.geometry if hasattr(targets, 'geometry') else targets))
+    crs = sources.estimate_utm_crs() if sources.crs is not None and sources.crs.is_geographic else sources.crs
+    projected = sources.to_crs(crs).reset_index(drop=True)
+    joined = gpd.sjoin_nearest(
+        projected, targets.to_crs(crs), how='left', distance_col='distance',
+        max_distance=max_distance * 1000 if max_distance is not None else None
+    )
+    # 距离相等的多个最近目标只保留一个
+    distance = joined.groupby(level=0)['distance'].first().reindex(projected.index) / 1000
+    return pd.Series(distance.to_numpy(), index=sources.index)
\ No newline at end of file
@@ -1,79 +1,76 @@
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
 from typing import Dict, List, Tuple, Optional
 import logging
 from datetime import datetime
-from sklearn.cluster import DBSCAN
-import networkx as nx
+from .model_registry import PersistableModel
+from .routing import RoutingEngine, RouteService
+from .capacity_flow import CapacityFlowSolver
+from .geo_clustering import HaversineDBSCAN
+from .inventory_policy import (
+    INVENTORY_KEYS, DEFAULT_SERVICE_LEVEL, DEFAULT_ORDER_COST, GroupParameter, compute_inventory_policies
+)
+from .inventory_simulation import simulate_inventory_policies, search_reorder_points
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SupplyChainModel:
+# 节点数不超过该值时 optimal_routes 展开为普通字典
+ROUTE_DICT_NODE_LIMIT = 500
+
+class SupplyChainModel(PersistableModel):
+    persistent_attributes = ('logistics_model', 'inventory_model', 'network_model', 'scaler')
+
     def __init__(self):
+        from sklearn.preprocessing import StandardScaler
+
         self.logistics_model = None
         self.inventory_model = None
+        self.network_model = None
         self.scaler = StandardScaler()
         
-    def optimize_logistics_routes(self, data: pd.DataFrame) -> Dict:
-        """优化物流路线"""
+    def optimize_logistics_routes(self, data: pd.DataFrame, dict_node_limit: int = ROUTE_DICT_NODE_LIMIT) -> Dict:
+        """优化物流路线
+
+        最短路由稀疏图的单源 Dijkstra 按起点分块求得。节点数不超过 dict_node_limit 时
+        optimal_routes 为普通字典（可直接 JSON 序列化）；更大的网络返回以 "起点-终点"
+        为键的只读映射 RouteTable，访问时才计算对应起点块，可用 to_dict() 展开。
+        """
         # 构建运输网络
-        G = nx.Graph()
-        
-        # 添加节点和边
-        for _, row in data.iterrows():
-            G.add_edge(
-                row['origin'],
-                row['destination'],
-                weight=row['transport_cost'],
-                time=row['transport_time'],
-                capacity=row['transport_capacity']
-            )
-            
-        # 计算最优路径
-        optimal_routes = {}
-        for origin in G.nodes():
-            for destination in G.nodes():
-                if origin != destination:
-                    try:
-                        path = nx.shortest_path(
-                            G, origin, destination,
-                            weight='weight'
-                        )
-                        path_time = nx.shortest_path_length(
-                            G, origin, destination,
-                            weight='time'
-                        )
-                        optimal_routes[f"{origin}-{destination}"] = {
-                            'path': path,
-                            'total_cost': nx.shortest_path_length(
-                                G, origin, destination,
-                                weight='weight'
-                            ),
-                            'total_time': path_time
-                        }
-                    except nx.NetworkXNoPath:
-                        continue
-                        
+        engine = RoutingEngine.from_edges(data)
+        self.logistics_model = engine
+        routes = engine.route_table()
+
         return {
-            'optimal_routes': optimal_routes,
-            'network_stats': self._calculate_network_stats(G)
+            'optimal_routes': routes.to_dict() if len(engine.nodes) <= dict_node_limit else routes,
+            'network_stats': engine.network_stats()
         }
     
-    def _calculate_network_stats(self, G: nx.Graph) -> Dict:
-        """计算网络统计指标"""
-        return {
-            'total_nodes': G.number_of_nodes(),
-            'total_edges': G.number_of_edges(),
-            'average_degree': sum(dict(G.degree()).values()) / G.number_of_nodes(),
-            'density': nx.density(G),
-            'average_clustering': nx.average_clustering(G),
-            'connected_components': nx.number_connected_components(G)
-        }
+    def build_route_service(self, data: pd.DataFrame, max_trees: int = 256) -> RouteService:
+        """构建按需查询的路线服务，缓存最近使用的 max_trees 棵最短路树"""
+        service = RouteService.from_logistics(data, max_trees)
+        self.logistics_model = service.engine
+        return service
+    
+    def optimize_capacitated_flows(self, data: pd.DataFrame, demands: pd.DataFrame,
+                                   metric: str = 'cost', volume_col: str = 'volume',
+                                   time_budget: Optional[float] = 30.0) -> Dict:
+        """在运力约束下分配起点-终点需求流量，返回路线、边利用率和未分配需求"""
+        engine = RoutingEngine.from_edges(data)
+        self.logistics_model = engine
+        result = CapacityFlowSolver(engine).solve(demands, metric, volume_col, time_budget)
+        summary = result['summary']
+        if summary['timed_out']:
+            logger.warning(f"流量分配超出时间预算，已分配{summary['fill_rate']:.1%}的需求")
+        return result
     
-    def optimize_inventory(self, data: pd.DataFrame) -> Dict:
-        """优化库存管理"""
+    def optimize_inventory(self, data: pd.DataFrame,
+                           service_level: GroupParameter = DEFAULT_SERVICE_LEVEL,
+                           order_cost: GroupParameter = DEFAULT_ORDER_COST) -> Dict:
+        """优化库存管理
+
+        optimal_inventory 按仓库汇总，按仓库-SKU 给出的参数在仓库内取均值；
+        数据含 sku 列时 inventory_policies 给出每个仓库-SKU 组合的库存策略。
+        """
         inventory_stats = data.groupby('warehouse').agg({
             'inventory_level': ['mean', 'std', 'min', 'max'],
             'demand': ['mean', 'std'],
@@ -81,43 +78,55 @@ class SupplyChainModel:
             'storage_cost': 'mean'
         })
         
-        optimal_inventory = {}
-        for warehouse in inventory_stats.index:
-            stats = inventory_stats.loc[warehouse]
-            
-            # 计算安全库存
-            service_level = 0.95  # 95%服务水平
-            z_score = 1.645  # 对应95%服务水平的z值
-            safety_stock = z_score * np.sqrt(
-                stats[('lead_time', 'mean')] * stats[('demand', 'std')]**2 +
-                stats[('demand', 'mean')]**2 * stats[('lead_time', 'mean')]
-            )
-            
-            # 计算经济订货量(EOQ)
-            annual_demand = stats[('demand', 'mean')] * 365
-            order_cost = 100  # 假设固定订货成本
-            holding_cost = stats[('storage_cost', 'mean')] / 365
-            eoq = np.sqrt((2 * annual_demand * order_cost) / holding_cost)
-            
-            optimal_inventory[warehouse] = {
-                'safety_stock': safety_stock,
-                'eoq': eoq,
-                'reorder_point': safety_stock + stats[('demand', 'mean')] * stats[('lead_time', 'mean')],
-                'max_inventory': safety_stock + eoq
-            }
-            
-        return {
+        warehouse_policies = compute_inventory_policies(data, ('warehouse',), service_level, order_cost)
+        optimal_inventory = warehouse_policies.set_index('warehouse')[
+            ['safety_stock', 'eoq', 'reorder_point', 'max_inventory']
+        ].to_dict('index')
+        
+        result = {
             'warehouse_stats': inventory_stats.to_dict(),
             'optimal_inventory': optimal_inventory
         }
+        if 'sku' in data.columns:
+            result['inventory_policies'] = self.compute_inventory_policies(data, INVENTORY_KEYS, service_level, order_cost)
+        else:
+            self.inventory_model = warehouse_policies
+        return result
+    
+    def compute_inventory_policies(self, data: pd.DataFrame, keys: Tuple[str, ...] = INVENTORY_KEYS,
+                                   service_level: GroupParameter = DEFAULT_SERVICE_LEVEL,
+                                   order_cost: GroupParameter = DEFAULT_ORDER_COST) -> pd.DataFrame:
+        """计算每个分组（默认仓库-SKU）的库存策略，返回列式结果"""
+        policies = compute_inventory_policies(data, keys, service_level, order_cost)
+        self.inventory_model = policies
+        return policies
+    
+    def simulate_inventory(self, data: pd.DataFrame, keys: Tuple[str, ...] = ('warehouse',),
+                           service_level: GroupParameter = DEFAULT_SERVICE_LEVEL,
+                           order_cost: GroupParameter = DEFAULT_ORDER_COST,
+                           target_fill_rate: Optional[float] = None, n_scenarios: int = 1000,
+                           horizon: int = 365, seed: int = 0, n_jobs: int = 1) -> pd.DataFrame:
+        """蒙特卡洛模拟库存策略的满足率和缺货概率
+
+        给定 target_fill_rate 时为每个分组搜索达到目标的最小再订货点。
+        """
+        policies = compute_inventory_policies(data, keys, service_level, order_cost)
+        if target_fill_rate is None:
+            return simulate_inventory_policies(policies, n_scenarios, horizon, seed, n_jobs)
+        return search_reorder_points(policies, target_fill_rate, n_scenarios=n_scenarios,
+                                     horizon=horizon, seed=seed, n_jobs=n_jobs)
     
-    def analyze_distribution_network(self, data: pd.DataFrame) -> Dict:
-        """分析配送网络"""
+    def analyze_distribution_network(self, data: pd.DataFrame, eps_km: float = 5.0,
+                                     min_samples: int = 5) -> Dict:
+        """分析配送网络
+
+        按球面距离对配送点做 DBSCAN 聚类，eps_km 为邻域半径（千米）；不修改输入数据。
+        """
         # 使用DBSCAN聚类分析配送中心位置
-        locations = data[['latitude', 'longitude']].values
-        clustering = DBSCAN(eps=0.5, min_samples=5).fit(self.scaler.fit_transform(locations))
+        clustering = HaversineDBSCAN(eps_km, min_samples).fit(data['latitude'], data['longitude'])
+        self.network_model = clustering
         
-        data['cluster'] = clustering.labels_
+        data = data.assign(cluster=clustering.labels_)
         
         cluster_stats = data.groupby('cluster').agg({
             'demand': 'sum',
@@ -131,6 +140,13 @@ class SupplyChainModel:
             'network_efficiency': self._calculate_network_efficiency(data)
         }
     
+    def assign_delivery_clusters(self, data: pd.DataFrame) -> pd.Series:
+        """把新的配送点分配到已有的簇（-1 表示不属于任何簇），无需重新聚类"""
+        if self.network_model is None:
+            raise ValueError("模型未训练")
+        labels = self.network_model.predict(data['latitude'], data['longitude'])
+        return pd.Series(labels, index=data.index, name='cluster')
+    
     def _analyze_coverage(self, data: pd.DataFrame) -> Dict:
         """分析服务覆盖范围"""
         return {
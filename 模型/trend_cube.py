@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from typing import List, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 立方体的维度和度量：数据中不存在的列会被忽略
+TREND_DIMENSIONS = ('category', 'brand', 'region')
+TREND_MEASURES = ('amount', 'quantity', 'profit_margin', 'price')
+# 可由月份周期派生的时间键
+TIME_KEYS = ('period', 'year', 'quarter', 'month')
+ROWS = 'rows'
+
+
+class TrendCube:
+    """按（月份, 维度...）预聚合的销售立方体
+
+    每个单元格保存各度量的求和、非空计数以及行数，均可直接相加，因此新数据
+    到达时只需聚合新数据并与已有单元格合并；报表按任意维度上卷读取，无需
+    重新扫描原始交易。月份为空或维度为空的行也保留在立方体中，总计不丢失。
+    """
+
+    def __init__(self, table: pd.DataFrame, dimensions: Sequence[str], measures: Sequence[str],
+                 date_col: str = 'date'):
+        self.table = table
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.date_col = date_col
+
+    @staticmethod
+    def columns_for(data: pd.DataFrame, date_col: str = 'date', dimensions: Sequence[str] = TREND_DIMENSIONS,
+                    measures: Sequence[str] = TREND_MEASURES) -> List[str]:
+        """立方体用到的原始列"""
+        return [date_col] + [column for column in list(dimensions) + list(measures) if column in data.columns]
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, date_col: str = 'date',
+                   dimensions: Sequence[str] = TREND_DIMENSIONS,
+                   measures: Sequence[str] = TREND_MEASURES) -> 'TrendCube':
+        """由原始交易构建立方体"""
+        dimensions = [column for column in dimensions if column in data.columns]
+        measures = [column for column in measures if column in data.columns]
+        cube = cls(None, dimensions, measures, date_col)
+        cube.table = cube._aggregate(data)
+        logger.info(f"趋势立方体：{len(data)}行交易聚合为{len(cube.table)}个单元格")
+        return cube
+
+    def _aggregate(self, data: pd.DataFrame) -> pd.DataFrame:
+        keys = [pd.to_datetime(data[self.date_col]).dt.to_period('M').rename('period')]
+        keys += [
+            data[column] if column in data.columns else pd.Series(np.nan, index=data.index, name=column)
+            for column in self.dimensions
+        ]
+        values = pd.DataFrame({
+            measure: pd.to_numeric(data[measure]) if measure in data.columns else np.nan
+            for measure in self.measures
+        }, index=data.index)
+        grouped = values.groupby(keys, dropna=False, observed=True)
+        sums = grouped.sum().add_suffix('_sum')
+        counts = grouped.count().add_suffix('_count')
+        return pd.concat([sums, counts, grouped.size().rename(ROWS)], axis=1)
+
+    def update(self, data: pd.DataFrame) -> 'TrendCube':
+        """增量合并新交易"""
+        partial = self._aggregate(data)
+        self.table = pd.concat([self.table, partial]).groupby(level=list(range(partial.index.nlevels)),
+                                                              dropna=False).sum()
+        logger.info(f"趋势立方体合并{len(data)}行新交易，共{len(self.table)}个单元格")
+        return self
+
+    def rollup(self, by: Sequence[str]) -> pd.DataFrame:
+        """按时间键（period/year/quarter/month）和维度上卷，返回各度量的求和、计数和行数
+
+        与直接对原始数据分组一致，分组键为空的单元格不参与。
+        """
+        cells = self.table.reset_index()
+        if any(key in TIME_KEYS for key in by):
+            cells = cells[cells['period'].notna()]
+        keys = []
+        for key in by:
+            if key in TIME_KEYS[1:]:
+                cells[key] = getattr(cells['period'].dt, key)
+            elif key not in cells.columns:
+                raise ValueError(f"未知的上卷键: {key}")
+            keys.append(key)
+        if not keys:
+            return cells[self.table.columns].sum().to_frame().T
+        return cells.groupby(keys, observed=True)[list(self.table.columns)].sum()
+
+    def total(self, measure: str) -> float:
+        """度量的总和"""
+        return self.table[f'{measure}_sum'].sum()
+
+    def mean(self, by: Sequence[str], measure: str) -> pd.Series:
+        """按 by 上卷后度量的均值（非空值平均）"""
+        rolled = self.rollup(by)
+        return rolled[f'{measure}_sum'] / rolled[f'{measure}_count'].replace(0, np.nan)
+
+    def period_mean(self, measure: str, freq: str = 'M') -> pd.Series:
+        """按年（Y）、季（Q）或月（M）的连续时间区间求均值，空区间为 NaN，以区间末日为索引"""
+        rolled = self.rollup(['period'])
+        if rolled.empty:
+            return pd.Series(dtype=np.float64)
+        grouped = rolled.groupby(rolled.index.asfreq(freq))[[f'{measure}_sum', f'{measure}_count']].sum()
+        grouped = grouped.reindex(pd.period_range(grouped.index.min(), grouped.index.max(), freq=freq))
+        means = grouped[f'{measure}_sum'] / grouped[f'{measure}_count'].replace(0, np.nan)
+        means.index = means.index.to_timestamp(how='end').normalize()
+        return means
+